@@ -0,0 +1,183 @@
+"""
+Pyboids - Benchmark
+ * Times each phase of the simulation step and whole generations of the genetic algorithm over a range of population
+ * sizes, writes the results as JSON and compares them with a stored baseline to catch regressions
+ * Copyright (c) 2019 Meaj
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import contextlib
+from Managers.SimulationEngine import SimulationEngine
+from Managers.Scenario import Scenario
+from Managers.FrameTimer import FrameTimer
+from BoidControllers.GeneticReynoldsControl import ReynoldsGeneticAlgorithm, ReynoldsChromosome
+
+STEP_SIZES = (32, 128, 512, 2048, 8192)
+GENERATION_SIZES = (32, 128)
+# The best genome found so far, see PyBoids.py
+GENOME = ReynoldsChromosome(-0.2726218754477409, 0.22531065494572736, 0.012347193295672765, 0.4056808036681063,
+                            0.5633023671766649, 0.768)
+
+
+# Deploys boid_number boids from a seeded scenario and times step_number steps, returning the mean step time and the
+# timings of each phase
+def benchmark_steps(boid_number, step_number, seed):
+    engine = SimulationEngine()
+    engine.set_max_pop(boid_number)
+    engine.set_end_time(step_number * engine.time_step)
+    engine.use_scenario(Scenario.for_engine(seed, engine))
+    engine.deploy_boids(boid_number)
+    engine.deploy_goals(engine.goal_count)
+    # The window covers every step, so the percentiles are over the whole run
+    engine.frame_timer = FrameTimer(step_number)
+    steps = 0
+    start = time.perf_counter()
+    while steps < step_number and engine.boid_list:
+        engine.step(GENOME)
+        steps += 1
+    elapsed = time.perf_counter() - start
+    return {"boids": boid_number, "steps": steps, "survivors": len(engine.boid_list),
+            "step_ms": elapsed / max(steps, 1) * 1000, "phases": engine.frame_timer.get_summary()}
+
+
+# Times generation_number full generations of species_number species with boid_number boids each, evaluating each
+# generation and breeding the next from it as the genetic run does
+def benchmark_generation(boid_number, species_number, end_time, seed, generation_number=2):
+    engine = SimulationEngine()
+    engine.set_max_pop(boid_number)
+    engine.set_end_time(end_time)
+    random.seed(seed)
+    # The last generation is never bred from, so one more is asked for than is timed
+    genetic_algorithm = ReynoldsGeneticAlgorithm(generation_number + 1, species_number, 20)
+    evaluation = 0.0
+    breeding = 0.0
+    simulated = 0.0
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(generation_number):
+            for idx, species in enumerate(genetic_algorithm.get_species_list()):
+                species.set_id(idx + 1)
+            start = time.perf_counter()
+            results = engine.evaluate_generation(genetic_algorithm.get_species_list(),
+                                                 genetic_algorithm.generation_number)
+            middle = time.perf_counter()
+            for species, result in zip(genetic_algorithm.get_species_list(), results):
+                fitness, live_time, survivors, terminated = result[:4]
+                species.update_live_time(live_time)
+                species.update_survivors(survivors)
+                species.update_performance(fitness)
+                species.update_terminated(terminated)
+            genetic_algorithm.advance_generation()
+            end = time.perf_counter()
+            evaluation += middle - start
+            breeding += end - middle
+            simulated += sum(result[1] for result in results)
+    return {"boids": boid_number, "species": species_number, "generations": generation_number,
+            "seconds": evaluation + breeding, "evaluation_seconds": evaluation, "breeding_seconds": breeding,
+            "simulated_seconds": simulated}
+
+
+# Flattens the results into {metric name: value} for the metrics compared against the baseline, lower is better
+def get_metrics(results):
+    metrics = {}
+    for size, result in results["steps"].items():
+        metrics["steps.{}.step_ms".format(size)] = result["step_ms"]
+        for phase, timings in result["phases"].items():
+            metrics["steps.{}.{}.p50_ms".format(size, phase)] = timings["p50_ms"]
+    for size, result in results["generations"].items():
+        metrics["generations.{}.seconds".format(size)] = result["seconds"]
+    return metrics
+
+
+# Returns (metric, baseline, current, ratio) for every metric that grew by more than its threshold ratio
+# metric_thresholds overrides the threshold of every metric whose name contains its key
+def find_regressions(results, baseline, threshold, metric_thresholds=None):
+    regressions = []
+    current = get_metrics(results)
+    for metric, base in get_metrics(baseline).items():
+        if metric not in current or base <= 0:
+            continue
+        limit = threshold
+        for key, value in (metric_thresholds or {}).items():
+            if key in metric:
+                limit = value
+        ratio = current[metric] / base
+        if ratio > limit:
+            regressions.append((metric, base, current[metric], ratio))
+    return regressions
+
+
+def run_benchmarks(step_sizes, generation_sizes, step_number, species_number, end_time, seed, generation_number=2):
+    results = {"config": {"step_sizes": list(step_sizes), "generation_sizes": list(generation_sizes),
+                          "steps": step_number, "species": species_number, "end_time": end_time, "seed": seed,
+                          "generations": generation_number, "python": sys.version.split()[0]},
+               "steps": {}, "generations": {}}
+    for size in step_sizes:
+        result = benchmark_steps(size, step_number, seed)
+        results["steps"][str(size)] = result
+        print("{:>6} boids: {:9.3f} ms per step over {} steps, {} survived".format(size, result["step_ms"],
+                                                                                 result["steps"],
+                                                                                 result["survivors"]))
+    for size in generation_sizes:
+        result = benchmark_generation(size, species_number, end_time, seed, generation_number)
+        results["generations"][str(size)] = result
+        print("{:>6} boids: {:9.3f} s for {} generations of {} species, {:.3f} s of it breeding".format(
+            size, result["seconds"], generation_number, species_number, result["breeding_seconds"]))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the PyBoids simulation step and genetic algorithm")
+    parser.add_argument("--sizes", type=int, nargs="+", default=STEP_SIZES, help="boid counts to time steps at")
+    parser.add_argument("--generation-sizes", type=int, nargs="*", default=GENERATION_SIZES,
+                        help="boid counts per species to time generations at")
+    parser.add_argument("--steps", type=int, default=60, help="steps timed at each size")
+    parser.add_argument("--species", type=int, default=8, help="species in each timed generation")
+    parser.add_argument("--generations", type=int, default=2, help="generations evaluated and bred at each size")
+    parser.add_argument("--end-time", type=float, default=2, help="simulated seconds of each species run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", default="benchmark_baseline.json",
+                        help="results to compare against, skipped if the file does not exist")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="largest allowed ratio of a metric to its baseline")
+    parser.add_argument("--metric-threshold", action="append", default=[], metavar="KEY=RATIO",
+                        help="threshold for the metrics whose name contains KEY, e.g. find_connections=1.5")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.sizes, args.generation_sizes, args.steps, args.species, args.end_time, args.seed,
+                             args.generations)
+    with open(args.output, "w") as output_file:
+        json.dump(results, output_file, indent=2)
+    print("Results written to {}".format(args.output))
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+        print("Baseline written to {}".format(args.baseline))
+        return 0
+    if not os.path.exists(args.baseline):
+        print("No baseline found at {}".format(args.baseline))
+        return 0
+
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    metric_thresholds = {}
+    for entry in args.metric_threshold:
+        key, value = entry.split("=")
+        metric_thresholds[key] = float(value)
+    regressions = find_regressions(results, baseline, args.threshold, metric_thresholds)
+    for metric, base, current, ratio in regressions:
+        print("REGRESSION {}: {:.3f} -> {:.3f} ({:.2f}x)".format(metric, base, current, ratio))
+    if not regressions:
+        print("No regressions against {}".format(args.baseline))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,77 +3,54 @@ Pyboids - BoidRules
  * A file containing the flocking rules based on those used in Craig Reynold's simulation
 """
 
-from Entities.Vector2D import Vector2D
+import numpy as np
 from Constants import MAX_FORCE
 
 
-def force_limiter(in_vector):
-    vector = in_vector
-    if vector.x > MAX_FORCE:
-        vector.x = MAX_FORCE
-    if vector.x < -MAX_FORCE:
-        vector.x = -MAX_FORCE
-
-    if vector.y > MAX_FORCE:
-        vector.y = MAX_FORCE
-    if vector.y < -MAX_FORCE:
-        vector.y = -MAX_FORCE
-    return vector
-
-
-# Encourage boids to move towards flock center
-def cohesion_rule(boid, flock):
-    center = Vector2D()
-    for member in flock:
-        if member is not boid and member is not None:
-            center += member.get_position()
-    center /= len(flock) - 1
-    return force_limiter(center - boid.get_position() - boid.get_velocity())
-
-
-# Encourage boids to avoid colliding as this causes mutual boid death
-def separation_rule(boid, flock):
-    avoid = Vector2D()
-    for member in flock:
-        if member is not boid and member is not None:
-            if abs(member.get_position() - boid.get_position()) <= boid.too_close:
-                boid.cost += 1  # Increment cost if we are too close
-                avoid -= (member.get_position() - boid.get_position())
-    return force_limiter(avoid - boid.get_velocity())
-
-
-# Encourage boids in a given flock to match the average velocity of the flock
-def alignment_rule(boid, flock):
-    perceived_vel = Vector2D()
-    for member in flock:
-        if member is not boid and member is not None:
-            perceived_vel += member.get_velocity()
-    perceived_vel /= len(flock) - 1
-    return force_limiter(perceived_vel - boid.get_velocity())
-
-
-# Encourage boids to head in the direction of the goal
-def tend_to_position(boid, position):
-    return force_limiter(position - boid.get_position() - boid.get_velocity())
-
-
-# Encourage boids to head away from the position
-def avoid_position(boid, position):
-    return force_limiter(-1 * (position - boid.get_position() - boid.get_velocity()))
-
-
-# Encourage boids to avoid walls as they can increase chance of collision
-def avoid_walls(boid, board_dims):
-    wall_avoid = Vector2D(0, 0)
-    boid_pos = boid.get_position()
-    if boid_pos.x < boid.radius * 2:
-        wall_avoid.x = boid.radius
-    elif boid_pos.x >= board_dims[0] - boid.radius * 2:
-        wall_avoid.x = -boid.radius
-
-    if boid_pos.y < boid.radius * 2:
-        wall_avoid.y = boid.radius
-    elif boid_pos.y >= board_dims[1] - boid.radius * 2:
-        wall_avoid.y = -boid.radius
-
-    return force_limiter(wall_avoid)
+# Limits each axis of every row of forces to MAX_FORCE
+def force_limiter_batch(forces):
+    return np.clip(forces, -MAX_FORCE, MAX_FORCE)
+
+
+# Evaluates the cohesion, separation and alignment rules for the boids in rows in one pass over the connection edges
+# of boid_array, returning the three limited steering forces and the number of neighbours each boid was too close to
+# Boids without connections get no steering from these rules
+def flocking_rules_batch(boid_array, rows, too_close):
+    edge_from, edge_to = boid_array.connection_edges
+    size = boid_array.count
+    offsets = boid_array.positions[edge_to] - boid_array.positions[edge_from]
+    close = np.hypot(offsets[:, 0], offsets[:, 1]) <= too_close
+
+    neighbours = np.bincount(edge_from, minlength=size)[rows]
+    close_counts = np.bincount(edge_from, close, minlength=size)[rows]
+    sums = np.empty((len(rows), 6))
+    for axis in (0, 1):
+        sums[:, axis] = np.bincount(edge_from, boid_array.positions[edge_to, axis], minlength=size)[rows]
+        sums[:, 2 + axis] = np.bincount(edge_from, boid_array.velocities[edge_to, axis], minlength=size)[rows]
+        sums[:, 4 + axis] = np.bincount(edge_from, np.where(close, offsets[:, axis], 0), minlength=size)[rows]
+
+    pos = boid_array.positions[rows]
+    vel = boid_array.velocities[rows]
+    connected = (neighbours > 0)[:, None]
+    count = np.maximum(neighbours, 1)[:, None]
+    cohesion = np.where(connected, force_limiter_batch(sums[:, 0:2] / count - pos - vel), 0)
+    alignment = np.where(connected, force_limiter_batch(sums[:, 2:4] / count - vel), 0)
+    separation = np.where(connected, force_limiter_batch(-sums[:, 4:6] - vel), 0)
+    return cohesion, separation, alignment, close_counts
+
+
+# Encourage the boids in rows to head towards their nearest goals
+def tend_to_position_batch(boid_array, rows):
+    return force_limiter_batch(boid_array.goal_positions[rows] - boid_array.positions[rows]
+                               - boid_array.velocities[rows])
+
+
+# Encourage the boids in rows to avoid walls as they can increase chance of collision
+def avoid_walls_batch(boid_array, rows, board_dims):
+    pos = boid_array.positions[rows]
+    radius = boid_array.radius
+    wall_avoid = np.zeros_like(pos)
+    for axis in (0, 1):
+        wall_avoid[:, axis] = np.where(pos[:, axis] < radius * 2, radius,
+                                       np.where(pos[:, axis] >= board_dims[axis] - radius * 2, -radius, 0))
+    return force_limiter_batch(wall_avoid)
@@ -7,7 +7,9 @@ Pyboids - GeneticReynoldsControl
 import copy
 import random
 import statistics
+import numpy as np
 from BoidControllers.BoidRules import *
+from Constants import RAN_TO_END, SURE_TO_SURVIVE
 
 
 class ReynoldsChromosome:
@@ -68,6 +70,7 @@ class ReynoldsSpecies:
         self.live_time = 0
         self.genome = genome
         self.performance = 1.0
+        self.terminated = RAN_TO_END  # Outcome of its run, racing stops species once they are sure of their rank
 
     def update_live_time(self, val):
         self.live_time = val
@@ -78,6 +81,9 @@ class ReynoldsSpecies:
     def update_performance(self, value):
         self.performance = value
 
+    def update_terminated(self, value):
+        self.terminated = value
+
     def generate_divergence_value(self):
         return random.randrange(int(-self.genome[5]*100), int(self.genome[5]*100))/100
 
@@ -96,6 +102,9 @@ class ReynoldsSpecies:
     def get_survivors(self):
         return self.survivor_number
 
+    def is_terminated(self):
+        return self.terminated
+
     def set_id(self, value):
         self.species_number = value
 
@@ -107,7 +116,6 @@ class ReynoldsGeneticAlgorithm:
         self.max_species = max_species  # This indicates how many species to create every generation
         self.mutation_rate = mutation_rate  # This is the rate at which genes will randomly mutate
         self.genetic_history_best_performers = []  # This tracks the chromosomes used by the best of each iteration
-        self.genetic_history = []  # This tracks the chromosomes used by each iteration each generation
         self.species_list = []  # This tracks the iterations used each generation, this is cleared once per gen
         self.survivors = []  # This tracks the iterations that survive after each culling
 
@@ -123,12 +131,22 @@ class ReynoldsGeneticAlgorithm:
         species_performances = []
         self.survivors = []
 
+        # Species stopped early were sure to survive or out of contention, so they rank above or below every species
+        # that ran to the end. They are given finite ranks, the median of both infinities would not be a number
+        finished = [species.performance for species in self.species_list if species.terminated == RAN_TO_END]
+        top = max(finished, default=0) + 1
+        bottom = min(finished, default=0) - 1
         for species in self.species_list:
-            species_performances.append(species.performance)
+            if species.terminated == RAN_TO_END:
+                species_performances.append(species.performance)
+            else:
+                species_performances.append(top if species.terminated == SURE_TO_SURVIVE else bottom)
         median = statistics.median(species_performances)
 
-        for species in self.species_list:
-            if species.performance >= median and len(self.survivors) < self.max_species/2:
+        for species, performance in zip(self.species_list, species_performances):
+            if species.terminated and species.terminated != SURE_TO_SURVIVE:
+                continue
+            if performance >= median and len(self.survivors) < self.max_species/2:
                 print("Gen {} species {} survived and will breed".format(self.generation_number, species.get_id()))
                 self.survivors.append(species)
             if len(self.survivors) == self.max_species/2:
@@ -317,37 +335,62 @@ class SeededReynoldsGeneticAlgorithm(ReynoldsGeneticAlgorithm):
                                                                           random.uniform(-1, 1) + seed[5])))
 
 
-def move_all_boids_genetic(boid_list, flock_manager, board_dims, playtime, iteration_chromosome=ReynoldsChromosome()):
+# wander optionally holds the random force of each boid in boid_list, as drawn in advance by a Scenario
+def move_all_boids_genetic(boid_list, flock_manager, board_dims, playtime, iteration_chromosome=ReynoldsChromosome(),
+                           wander=None):
     chromosome = iteration_chromosome
-    # Create a dictionary of all boids by id to quickly search for boids by id values extracted from flock
-    flock_list = flock_manager.get_flocks()
-
-    for boid in boid_list:
-        for flock in flock_list:
-            if boid in flock.flock_members:
-                # Calculate components of our velocity based on various rules
-                if len(boid.connected_boids) > 1:
-                    v1 = cohesion_rule(boid, boid.connected_boids) * chromosome.cohesion_gene
-                    v2 = separation_rule(boid, boid.connected_boids) * chromosome.separation_gene
-                    v3 = alignment_rule(boid, boid.connected_boids) * chromosome.alignment_gene
-                else:
-                    v1 = v2 = v3 = Vector2D()
-                # Special rule to check if goal is visible
-                if boid.is_object_visible(boid.calc_angle_from_pos(boid.nearest_goal.get_position())):
-                    v4 = tend_to_position(boid, boid.nearest_goal.get_position())
-                else:
-                    v4 = Vector2D(random.randrange(-MAX_FORCE, MAX_FORCE), random.randrange(-MAX_FORCE, MAX_FORCE))
-                v4 *= chromosome.goal_seeking_gene
-                v5 = avoid_walls(boid, board_dims) * chromosome.wall_avoidance_gene
-
-                dv = v1 + v2 + v3 + v4 + v5
-
-                dv *= boid.get_divergence()
-
-                boid.update_velocity(dv)
-                boid.update_position(board_dims)
-
-                boid.update_cost(flock, playtime)
-
-
-
+    # Boids only move once they have joined a flock, the flocks of the last frame are used for every boid
+    boid_array = flock_manager.boid_array
+    if boid_array is None:
+        return
+    in_array = np.array([boid.boid_array is boid_array for boid in boid_list], dtype=bool)
+    rows = np.array([boid.slot for boid in boid_list], dtype=np.intp)[in_array]
+    if wander is not None:
+        wander = wander[in_array]
+    weights = np.array([chromosome.cohesion_gene, chromosome.separation_gene, chromosome.alignment_gene,
+                        chromosome.goal_seeking_gene, chromosome.wall_avoidance_gene])
+    steer_boids(boid_array, rows, flock_manager, board_dims, playtime, weights, wander)
+
+
+# Moves the boids in rows that have joined a flock. weights holds the cohesion, separation, alignment, goal seeking and
+# wall avoidance genes, either once for every boid or as one row of genes per boid in rows
+# wander holds the random force of each boid in rows, otherwise the forces are drawn from random as they are needed
+def steer_boids(boid_array, rows, flock_manager, board_dims, playtime, weights, wander=None):
+    labels = boid_array.flock_labels[rows]
+    joined = labels >= 0
+    rows = rows[joined]
+    labels = labels[joined]
+    if weights.ndim == 2:
+        weights = weights[joined]
+    if wander is not None:
+        wander = wander[joined]
+    if len(rows) == 0:
+        return
+
+    # Calculate components of our velocity based on various rules, all of the boids are steered at once
+    v1, v2, v3, too_close_counts = flocking_rules_batch(boid_array, rows, boid_array.radius * 4)
+    boid_array.costs[rows] += too_close_counts  # Increment cost for each neighbour we are too close to
+    # Special rule to check if goal is visible, boids that cannot see a goal wander randomly
+    v4 = tend_to_position_batch(boid_array, rows)
+    goal_hidden = boid_array.goal_ids[rows] < 0
+    if wander is not None:
+        v4[goal_hidden] = wander[goal_hidden]
+    else:
+        for idx in np.nonzero(goal_hidden)[0]:
+            v4[idx] = random.randrange(-MAX_FORCE, MAX_FORCE), random.randrange(-MAX_FORCE, MAX_FORCE)
+    v5 = avoid_walls_batch(boid_array, rows, board_dims)
+
+    weights = weights.reshape(-1, 5)
+    dv = v1 * weights[:, 0:1] + v2 * weights[:, 1:2] + v3 * weights[:, 2:3] + v4 * weights[:, 3:4] + \
+        v5 * weights[:, 4:5]
+    dv *= boid_array.divergences[rows, None]
+
+    boid_array.update_velocities(rows, dv)
+    boid_array.update_positions(rows, board_dims)
+
+    # Penalties for straying from the flock's heading, not seeing a goal and the flock not heading to its goal
+    flock_argument = flock_manager.velocity_arguments[labels]
+    flock_goal_dir = flock_manager.goal_dirs[labels]
+    boid_array.costs[rows] += np.abs((boid_array.headings[rows] - flock_argument) / 360) + goal_hidden + \
+        np.where(flock_goal_dir == -1, 1, np.abs((flock_goal_dir - flock_argument) / 360))
+    boid_array.live_times[rows] = playtime
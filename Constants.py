@@ -1,4 +1,4 @@
-import pygame
+# Constants are kept free of pygame so that the simulation core can run without it
 
 # Game_state Definitions
 LOADED = -2
@@ -11,6 +11,11 @@ RUN_SIMULATION = 4
 PAUSE_SIMULATION = 5
 END_SIMULATION = 6
 
+# Outcome of a species run, racing stops species early once they are sure to survive or out of contention
+RAN_TO_END = 0
+OUT_OF_CONTENTION = 1
+SURE_TO_SURVIVE = 2
+
 # Color Definitions
 RED = (255, 0, 0)
 PURPLE = (230, 0, 230)
@@ -21,15 +26,15 @@ LIGHT_GREY = (85, 85, 85)
 BLACK = (0, 0, 0)
 GOLD = (128, 128, 64)
 
-ENTRY_KEYS = [pygame.K_0, pygame.K_1, pygame.K_2, pygame.K_3, pygame.K_4, pygame.K_5, pygame.K_6,
-              pygame.K_7, pygame.K_8, pygame.K_9, pygame.K_PERIOD, pygame.K_KP_MINUS, pygame.K_MINUS]
-
 # Maximum velocity a boid can move in any direction
 MAX_VELOCITY = 3.5
 
 # Maximum force applied to the boid from control rules
 MAX_FORCE = 2
 
+# Simulation steps run for each displayed frame, W cycles through them. 0 runs as many steps as fit between frames
+TIME_WARPS = (1, 4, 32, 0)
+
 # Format for update is completed_release.goal_number.update_number
 VERSION = "0.5.1"
 
@@ -0,0 +1,195 @@
+"""
+Pyboids - BoidArray
+ * A class containing the definitions of the BoidArray object, which stores the state of every boid in a world as
+ * contiguous NumPy arrays so that whole populations can be updated with a handful of vector operations
+ * Copyright (c) 2019 Meaj
+"""
+import numpy as np
+from Constants import MAX_VELOCITY
+
+
+# Returns the angle of each vector relative to [0, 1] in degrees, matching Vector2D.argument() for every row
+def calc_arguments(vectors):
+    magnitude = np.hypot(vectors[:, 0], vectors[:, 1])
+    moving = magnitude != 0
+    cos_theta = np.clip(vectors[:, 1] / np.where(moving, magnitude, 1), -1, 1)
+    arg = np.where(moving, np.degrees(np.arccos(cos_theta)), 0)
+    return np.where(vectors[:, 0] < 0, 360 - arg, arg)
+
+
+# Returns the heading of each velocity in degrees, matching (180 + Vector2D.argument()) % 360 for every row
+def calc_headings(velocities):
+    return (180 + calc_arguments(velocities)) % 360
+
+
+# Compares each of the N subject boids with its K candidate neighbours at once, candidates is an (N, K) array of slots
+# padded with -1. Returns the N x K distance and relative bearing matrices along with the visible, connected and
+# colliding masks. Boids see a 270 degree field of view, connect within too_far and collide within radius
+# When targets is passed, candidates index into targets instead of positions, such as the positions of goals
+# When previous is passed, pairs collide if they came within radius at any point of the step that moved them from
+# previous to positions, so fast boids cannot pass through each other between frames. Each boid moves at most
+# sqrt(2) * MAX_VELOCITY in a step, so only pairs ending within radius plus twice that are swept
+def visibility_kernel(positions, headings, subjects, candidates, too_far, radius, targets=None, previous=None):
+    subjects = np.asarray(subjects, dtype=np.intp)
+    if targets is None:
+        valid = (candidates >= 0) & (candidates != subjects[:, None])
+        others = np.where(valid, candidates, subjects[:, None])
+        delta = positions[subjects][:, None, :] - positions[others]
+    else:
+        valid = candidates >= 0
+        delta = positions[subjects][:, None, :] - targets[np.where(valid, candidates, 0)]
+    dist = np.hypot(delta[..., 0], delta[..., 1])
+    closest = dist
+    if previous is not None and targets is None:
+        near = np.nonzero(valid & (dist <= radius + 2 * np.sqrt(2) * MAX_VELOCITY))
+        closest = dist.copy()
+        closest[near] = calc_closest_approach(previous[subjects[near[0]]] - previous[others[near]], delta[near])
+    bearing = (np.degrees(-np.arctan2(delta[..., 1], delta[..., 0])) + 90) % 360
+
+    # The blind spot is the 90 degree arc behind the boid
+    blind_start = ((135 + headings[subjects]) % 360)[:, None]
+    blind_end = ((225 + headings[subjects]) % 360)[:, None]
+    visible = valid & ~((blind_start <= bearing) & (bearing <= blind_end))
+    colliding = valid & (closest <= radius)
+    connected = visible & (dist <= too_far) & ~colliding
+    return dist, bearing, visible, connected, colliding
+
+
+# Returns the closest distance between each pair of boids over a step, given how far apart they were at its start and
+# at its end. Both move in a straight line during the step, so their separation moves along the segment between the two
+def calc_closest_approach(start, end):
+    travel = end - start
+    length = np.einsum("...i,...i", travel, travel)
+    along = np.clip(-np.einsum("...i,...i", start, travel) / np.where(length > 0, length, 1), 0, 1)
+    closest = start + along[..., None] * travel
+    return np.hypot(closest[..., 0], closest[..., 1])
+
+
+# Value each per boid array holds in a slot that has not been handed out, or when its slot is reused
+ROW_DEFAULTS = {"positions": 0, "previous_positions": 0, "velocities": 0, "headings": 0, "scores": 0, "costs": 0,
+                "live_times": 0, "alive": False, "flock_labels": -1, "goal_ids": -1, "goal_positions": 0,
+                "nearest_goals": None, "goal_dirs": 0, "touched_goals": False, "ranks": 0, "divergences": 1}
+
+
+class BoidArray:
+    def __init__(self, capacity, radius):
+        self.radius = radius                                      # shared radius of every boid in the array
+        self.count = 0                                            # number of slots handed out so far
+        self.positions = np.zeros((capacity, 2))                  # x, y position of each boid
+        self.previous_positions = np.zeros((capacity, 2))         # x, y position of each boid before its last move
+        self.velocities = np.zeros((capacity, 2))                 # x, y velocity of each boid
+        self.headings = np.zeros(capacity)                        # current heading of each boid in degrees
+        self.scores = np.zeros(capacity, dtype=np.int64)          # used as part of evaluating the fitness of the model
+        self.costs = np.zeros(capacity)                           # used as part of evaluating the fitness of the model
+        self.live_times = np.zeros(capacity)                      # used as part of evaluating the fitness of the model
+        self.alive = np.zeros(capacity, dtype=bool)               # False once the boid in the slot has died
+        self.flock_labels = np.full(capacity, -1, dtype=np.intp)  # index of the flock of each boid, -1 for none
+        self.goal_ids = np.full(capacity, -1, dtype=np.intp)      # id of the nearest goal if visible, otherwise -1
+        self.goal_positions = np.zeros((capacity, 2))             # x, y position of the nearest goal of each boid
+        self.nearest_goals = np.full(capacity, None, dtype=object)  # nearest goal of each boid, None until searched
+        self.goal_dirs = np.zeros(capacity)                       # bearing of the nearest goal, -1 if not visible
+        self.touched_goals = np.zeros(capacity, dtype=bool)       # True when a boid has just reached its nearest goal
+        self.divergences = np.ones(capacity)                      # used to produce random movement between boids
+        self.ranks = np.zeros(capacity, dtype=np.intp)            # position of each boid in the rows last searched
+        self.boids = []                                           # Boid view objects indexed by slot
+        self.free_slots = []                                      # slots of dead boids, handed out before new ones
+        self.colliding_slots = []                                 # slots given collisions by find_connections
+        self.touched_slots = np.zeros(0, dtype=np.intp)           # slots that touched a goal in set_nearest_goals
+        self.connection_edges = (np.zeros(0, dtype=np.intp),      # slots of each connection found by the last
+                                 np.zeros(0, dtype=np.intp))      # call to find_connections, as (from, to)
+
+    def get_capacity(self):
+        return len(self.alive)
+
+    # Doubles the size of every array, keeping the data of the slots already handed out
+    def grow(self):
+        capacity = max(1, 2 * self.get_capacity())
+        for name in ROW_DEFAULTS:
+            old = getattr(self, name)
+            new = np.full((capacity,) + old.shape[1:], ROW_DEFAULTS[name], dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    # Returns every slot to its default values and marks it dead, keeping the boid views so they can be reused
+    def clear(self):
+        for name, fill in ROW_DEFAULTS.items():
+            getattr(self, name)[:] = fill
+        self.free_slots = []
+        self.colliding_slots = []
+        self.touched_slots = np.zeros(0, dtype=np.intp)
+        self.connection_edges = (np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp))
+
+    # Reserves a slot for the passed boid view and returns its index, the slot of a dead boid is reused if there is one
+    def add_boid(self, boid):
+        if self.free_slots:
+            slot = self.free_slots.pop()
+            for name, fill in ROW_DEFAULTS.items():
+                getattr(self, name)[slot] = fill
+            self.boids[slot] = boid
+        else:
+            if self.count == self.get_capacity():
+                self.grow()
+            slot = self.count
+            self.count += 1
+            self.boids.append(boid)
+        self.alive[slot] = True
+        return slot
+
+    # Marks the boid in slot as dead and frees the slot, killing a boid that is already dead does nothing
+    def kill(self, slot):
+        if self.alive[slot]:
+            self.alive[slot] = False
+            self.free_slots.append(slot)
+
+    # Adds the steering forces in dv to the velocities of the boids in rows and limits each axis to MAX_VELOCITY
+    def update_velocities(self, rows, dv):
+        self.velocities[rows] = np.clip(self.velocities[rows] + dv, -MAX_VELOCITY, MAX_VELOCITY)
+
+    # Moves the boids in rows by their velocity, keeps them inside the simulation area and updates their headings
+    def update_positions(self, rows, board_dims):
+        self.previous_positions[rows] = self.positions[rows]
+        pos = self.positions[rows] + self.velocities[rows]
+        pos[:, 0] = np.clip(pos[:, 0], self.radius, board_dims[0] - self.radius)
+        # 12 is the height of the in_text display at the top
+        pos[:, 1] = np.clip(pos[:, 1], 12 + self.radius, board_dims[1] - self.radius)
+        self.positions[rows] = pos
+        self.headings[rows] = calc_headings(self.velocities[rows])
+
+    # Runs the visibility kernel for the boids in rows against their candidate neighbours
+    # Connections are kept as slot pairs in connection_edges for the batched rules and flock formation, only the
+    # collision lists are stored on the boid views since the manager removes colliding boids one at a time
+    # Collisions are tested over the whole of the last step, and only the lists of the boids that collided in the last
+    # call are cleared, so the lists never hold collisions from earlier frames
+    def find_connections(self, rows, candidates, too_far):
+        rows = np.asarray(rows, dtype=np.intp)
+        self.ranks[rows] = np.arange(len(rows))
+        dist, bearing, visible, connected, colliding = visibility_kernel(self.positions, self.headings, rows,
+                                                                         candidates, too_far, self.radius,
+                                                                         previous=self.previous_positions)
+        self.connection_edges = (rows[np.nonzero(connected)[0]], candidates[connected])
+        for slot in self.colliding_slots:
+            self.boids[slot].collisions = []
+        colliders = np.nonzero(colliding.any(axis=1))[0]
+        self.colliding_slots = rows[colliders].tolist()
+        for idx, slot in zip(colliders, self.colliding_slots):
+            self.boids[slot].collisions = [self.boids[other] for other in candidates[idx, colliding[idx]]]
+
+    # Stores the nearest goal found for each boid in rows by GoalIndex.find_nearest_goals, along with its position and
+    # id. A boid touches its goal when it comes within two radii of it, but not on two steps in a row
+    def set_nearest_goals(self, rows, goals, targets, goal_ids):
+        dist, bearing, visible, connected, colliding = visibility_kernel(self.positions, self.headings, rows,
+                                                                         np.arange(len(rows))[:, None], 0, 0, targets)
+        visible = visible[:, 0]
+        self.goal_positions[rows] = targets
+        self.goal_ids[rows] = np.where(visible, goal_ids, -1)
+        self.goal_dirs[rows] = np.where(visible, bearing[:, 0], -1)
+        touched = ~self.touched_goals[rows] & (dist[:, 0] < self.radius * 2)
+        self.touched_goals[rows] = touched
+        self.touched_slots = rows[touched]
+        self.nearest_goals[rows] = goals
+
+    # Returns the slots that collided or touched a goal in the last step, in the order of the rows they were found in
+    # These are the only boids the manager has to handle, so a step costs the same however many boids are idle
+    def get_event_slots(self):
+        slots = np.union1d(np.asarray(self.colliding_slots, dtype=np.intp), self.touched_slots)
+        return slots[np.argsort(self.ranks[slots], kind="stable")]
@@ -3,12 +3,11 @@ Pyboids - Entities
  * A class containing the definitions of the entity object and the objects that extend it
  * Copyright (c) 2019 Meaj
 """
-import math
 from Entities import Vector2D
+from Entities.BoidArray import BoidArray
 from Constants import *
 
 
-
 class Entity:
     def __init__(self, entity_id, x_pos, y_pos):
         self.entity_id = entity_id
@@ -26,40 +25,114 @@ class Goal(Entity):
         super().__init__(goal_id, x, y)
         self.radius = radius
 
-    # Draws shapes representing goal objects
-    def display_goal(self, screen):
-        surface = pygame.Surface((2*self.radius, 2*self.radius))
-        surface.convert_alpha(surface)
-        surface.set_colorkey(BLACK)
-        pygame.draw.circle(surface, GOLD, (self.radius, self.radius), self.radius)
-        screen.blit(surface, (self.pos.x, self.pos.y))
+    # Places the goal again as if it were new, used when a pooled goal is redeployed
+    def reset(self, goal_id, x, y, radius):
+        self.entity_id = goal_id
+        self.pos.x = x
+        self.pos.y = y
+        self.radius = radius
+
 
 class Boid(Entity):
 
-    def __init__(self, boid_id, x, y, radius, divergence_value=1):
+    def __init__(self, boid_id, x, y, radius, divergence_value=1, boid_array=None):
+        # Boids are views onto a row of a BoidArray, a boid created on its own gets a private single row array
+        if boid_array is None:
+            boid_array = BoidArray(1, radius)
+        self.boid_array = boid_array                    # array holding the position, velocity and scoring data
+        self.slot = boid_array.add_boid(self)           # row of this boid in boid_array
         super().__init__(boid_id, x, y)
         self.radius = radius                            # used in display calculations
         self.too_close = self.radius * 4                # used to determine when boids should avoid each other
         self.too_far = self.radius * 16                 # used to determine when the boids are too far to flock
-        self.vel = Vector2D.Vector2D()                  # current velocity of the boid
-        self.my_dir = 0                                 # current heading of the boid
         self.divergence = divergence_value              # used to produce random movement between boids
 
-        self.connected_boids = []                       # list of all visible boids in range
-        self.visible_boids = []                         # List of all visible boids
         self.collisions = []                            # list of boids we are too close to
-        
-        self.touched_goal = False                       # used to alert manager when a coin is touched
-        self.nearest_goal = Entity(0, 0, 0)             # used in boid movement and flock formation
-        self.goal_dir = 0                               # direction of nearest goal relative to boid
-        
-        self.score = 0                                  # used as part of evaluating the fitness of the model
-        self.cost = 0                                   # used as part of evaluating the fitness of the model
-        self.live_time = 0                              # used as part of evaluating the fitness of the model
-
-    # Returns the magnitude of the velocity vector, the speed of the boid
-    def get_speed(self):
-        return abs(self.vel)
+        self.no_goal = Entity(0, 0, 0)                  # placeholder nearest goal until a goal has been searched for
+
+    # Places the boid again as if it were new, used when a pooled boid joins a new population
+    # The state kept in the BoidArray row is reset by BoidArray.clear
+    def reset(self, boid_id, x, y):
+        self.entity_id = boid_id
+        self.boid_array.positions[self.slot] = (x, y)
+        self.boid_array.previous_positions[self.slot] = (x, y)
+        self.collisions = []
+
+    # Position, velocity, heading, score, cost, divergence, live time and the nearest goal are stored in the BoidArray
+    # row of the boid
+    # Setting the position places the boid without sweeping it through the space in between for collisions
+    @property
+    def pos(self):
+        return Vector2D.Vector2D(float(self.boid_array.positions[self.slot, 0]),
+                                 float(self.boid_array.positions[self.slot, 1]))
+
+    @pos.setter
+    def pos(self, val):
+        self.boid_array.positions[self.slot] = (val.x, val.y)
+        self.boid_array.previous_positions[self.slot] = (val.x, val.y)
+
+    @property
+    def vel(self):
+        return Vector2D.Vector2D(float(self.boid_array.velocities[self.slot, 0]),
+                                 float(self.boid_array.velocities[self.slot, 1]))
+
+    @vel.setter
+    def vel(self, val):
+        self.boid_array.velocities[self.slot] = (val.x, val.y)
+
+    @property
+    def my_dir(self):
+        return float(self.boid_array.headings[self.slot])
+
+    @my_dir.setter
+    def my_dir(self, val):
+        self.boid_array.headings[self.slot] = val
+
+    @property
+    def score(self):
+        return int(self.boid_array.scores[self.slot])
+
+    @score.setter
+    def score(self, val):
+        self.boid_array.scores[self.slot] = val
+
+    @property
+    def cost(self):
+        return float(self.boid_array.costs[self.slot])
+
+    @cost.setter
+    def cost(self, val):
+        self.boid_array.costs[self.slot] = val
+
+    @property
+    def divergence(self):
+        return float(self.boid_array.divergences[self.slot])
+
+    @divergence.setter
+    def divergence(self, val):
+        self.boid_array.divergences[self.slot] = val
+
+    @property
+    def live_time(self):
+        return float(self.boid_array.live_times[self.slot])
+
+    @live_time.setter
+    def live_time(self, val):
+        self.boid_array.live_times[self.slot] = val
+
+    # The nearest goal, its direction relative to the boid and whether it was touched are set by find_nearest_goals
+    @property
+    def nearest_goal(self):
+        goal = self.boid_array.nearest_goals[self.slot]
+        return self.no_goal if goal is None else goal
+
+    @property
+    def goal_dir(self):
+        return float(self.boid_array.goal_dirs[self.slot])
+
+    @property
+    def touched_goal(self):
+        return bool(self.boid_array.touched_goals[self.slot])
 
     def get_direction(self):
         return self.my_dir
@@ -67,12 +140,6 @@ class Boid(Entity):
     def get_goal_dir(self):
         return self.goal_dir
 
-    def get_connected_boids(self):
-        return self.connected_boids
-
-    def get_visible_boids(self):
-        return self.visible_boids
-
     def get_collisions(self):
         return self.collisions
 
@@ -97,137 +164,15 @@ class Boid(Entity):
     def get_cost(self):
         return self.cost
 
+    def is_alive(self):
+        return bool(self.boid_array.alive[self.slot])
+
+    def kill(self):
+        self.boid_array.kill(self.slot)
+
     def set_divergence(self, val):
         self.divergence = val
 
-    def update_velocity(self, val):
-        val += self.vel
-        # Velocity limiting rules
-        if val.x >= MAX_VELOCITY:
-            val.x = MAX_VELOCITY
-        elif val.x <= -MAX_VELOCITY:
-            val.x = -MAX_VELOCITY
-
-        if val.y >= MAX_VELOCITY:
-            val.y = MAX_VELOCITY
-        elif val.y <= -MAX_VELOCITY:
-            val.y = -MAX_VELOCITY
-
-        self.vel = val
-
-    # Move the boid on the simulation area
-    def update_position(self, board_dims):
-        self.pos += self.vel
-        x = self.pos[0]
-        y = self.pos[1]
-        # Change our x position
-        if x >= board_dims[0] - self.radius:
-            x = board_dims[0] - self.radius
-        if x < self.radius:
-            x = self.radius
-        # Change our y position
-        if y >= board_dims[1] - self.radius:
-            y = board_dims[1] - self.radius
-        if y < 12 + self.radius:  # 12 is the height of the in_text display at the top
-            y = 12 + self.radius
-        self.pos = Vector2D.Vector2D(x, y)
-        self.my_dir = (180 + self.vel.argument()) % 360
-
     # Increments the score by the passed value or 1 by default
     def increment_score(self, val=1):
         self.score += val
-
-    def update_cost(self, flock, playtime):
-        # penalty for not following the same average dir as the flock
-        self.cost += abs((self.my_dir - flock.flock_velocity.argument())/360)
-        # penalty for not heading towards a goal
-        if self.goal_dir == -1:
-            self.cost += 1
-        # penalty for flock not heading towards the flock's perceived goal direction
-        if flock.flock_goal_dir == -1:
-            self.cost += 1
-        else:
-            self.cost += abs((flock.flock_goal_dir - flock.flock_velocity.argument())/360)
-
-        # Update live_time
-        self.live_time = playtime
-
-    # Takes a tuple containing the position of an object and returns its angle relative to the boid's heading
-    def calc_angle_from_pos(self, obj_pos):
-        temp_theta = math.atan2(self.pos.y - obj_pos.y, self.pos.x - obj_pos.x)
-        if temp_theta < 0:
-            temp_theta = abs(temp_theta)
-        else:
-            temp_theta = 2 * math.pi - temp_theta
-        return (math.degrees(temp_theta) + 90) % 360
-
-    # Takes an angle theta and checks if it is in visible range of the boid
-    def is_object_visible(self, theta):
-        arc = (135 + self.my_dir) % 360, (225 + self.my_dir) % 360
-        if arc[0] <= theta <= arc[1]:
-            return False
-        else:
-            return True
-
-    # Just your friendly neighborhood distance formula
-    def calc_dist_to_object(self, pos):
-        return math.sqrt(math.pow(self.pos[0] - pos[0], 2) + pow(self.pos[1] - pos[1], 2))
-
-    # Creates a list of connections, that is boids that are visible and have a distance within range
-    # If boids collide, a list is made so that the game manager can remove them
-    def find_connections(self, list_of_boids):
-        self.connected_boids = [self]
-        self.visible_boids = []
-
-        # For each boid that isn't us, get the id, distance to it, and relative angle
-        for temp_boid in list_of_boids:
-            if temp_boid.entity_id != self.entity_id:
-                theta = self.calc_angle_from_pos(temp_boid.get_position())
-                dist = self.calc_dist_to_object(temp_boid.get_position())
-                if self.is_object_visible(theta):
-                    self.visible_boids.append(temp_boid)
-                # If the boid is in our range of vision and close enough, add it to our connection list
-                if self.is_object_visible(theta) and dist <= self.too_far:
-                    self.connected_boids.append(temp_boid)
-                # If the boid is too close, add it to our collision list and remove it from our connections if present
-                if dist <= self.radius:
-                    self.collisions.append(temp_boid)
-                    if temp_boid in self.connected_boids:
-                        self.connected_boids.remove(temp_boid)
-
-    # Finds the nearest goal and sets touched_goal to true when appropriate
-    def find_nearest_goal(self, goal_list):
-        nearest = goal_list[-1]
-        for goal in goal_list:
-            if nearest is not goal and self.is_object_visible(self.calc_angle_from_pos(goal.get_position())):
-                if abs(goal.get_position() - self.pos) < abs(nearest.get_position() - self.pos):
-                    nearest = goal
-        self.nearest_goal = nearest
-        if not self.touched_goal and self.calc_dist_to_object(self.nearest_goal.get_position()) < self.radius*2:
-            self.touched_goal = True
-        else:
-            self.touched_goal = False
-        temp = self.calc_angle_from_pos(self.nearest_goal.get_position())
-        if self.is_object_visible(temp):
-            self.goal_dir = temp  # goal is visible
-        else:
-            self.goal_dir = -1  # goal is not visible
-
-    # Draws shapes representing the boid objects
-    def display_boid(self, boid_image, screen, background, draw_details):
-        angle = self.my_dir
-        boid_shape = boid_image
-        boid_shape = pygame.transform.rotozoom(boid_shape, angle, 1)
-        boid_rect = boid_shape.get_rect(center=(self.pos.x, self.pos.y))
-        screen.blit(boid_shape, boid_rect)
-        if draw_details:
-            txt_surface = pygame.font.SysFont('mono', 10, bold=False).render(str(self.entity_id), True, (0, 255, 0))
-            too_close_rect = pygame.Rect(0, 0, self.too_close, self.too_close)
-            too_close_rect.center = (self.pos.x, self.pos.y)
-            pygame.draw.arc(background, RED, too_close_rect,
-                            math.radians(angle - 135 + 90), math.radians(angle + 135 + 90))
-            too_far_rect = pygame.Rect(0, 0, self.too_far, self.too_far)
-            too_far_rect.center = (self.pos.x, self.pos.y)
-            pygame.draw.arc(background, GOLD, too_far_rect,
-                            math.radians(angle - 135 + 90), math.radians(angle + 135 + 90))
-            screen.blit(txt_surface, (self.pos.x, self.pos.y))
\ No newline at end of file
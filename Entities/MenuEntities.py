@@ -1,5 +1,9 @@
+import pygame
 from Constants import *
 
+ENTRY_KEYS = [pygame.K_0, pygame.K_1, pygame.K_2, pygame.K_3, pygame.K_4, pygame.K_5, pygame.K_6,
+              pygame.K_7, pygame.K_8, pygame.K_9, pygame.K_PERIOD, pygame.K_KP_MINUS, pygame.K_MINUS]
+
 
 class Button:
     def __init__(self, text, x_pos, y_pos, width, height, function=None):
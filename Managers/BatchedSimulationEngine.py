@@ -0,0 +1,223 @@
+"""
+Pyboids - BatchedSimulationEngine
+ * A class containing the definitions of the BatchedSimulationEngine object, which simulates every species of a
+ * generation side by side in one BoidArray so that each vector operation advances all of their worlds at once
+ * Copyright (c) 2019 Meaj
+"""
+import numpy as np
+from Constants import *
+from Managers.FlockManager import FlockManager
+from Managers.GoalIndex import find_nearest_goals
+from Managers.SimulationEngine import SimulationEngine
+from BoidControllers.GeneticReynoldsControl import steer_boids
+
+
+class BatchedSimulationEngine(SimulationEngine):
+    def __init__(self, window_width=980, sim_area_height=620, fps=30, boid_radius=7):
+        super().__init__(window_width, sim_area_height, fps, boid_radius)
+        self.worlds = []                                # One engine per species, holding its boids, goals and score
+        self.world_pool = []                            # Every world made so far, reused by later batches
+        self.world_of_slot = np.zeros(0, dtype=np.intp)  # Index in worlds of the boid in each BoidArray slot
+
+    # Deploys one world per species into a shared BoidArray and FlockManager. Every world is deployed from the same
+    # scenario and keeps its own respawn count, so each one plays out exactly as evaluate_species would play it
+    # The worlds and the boids of the last batch are reset and reused, world idx holds the boids of slots
+    # idx * max_pop up to (idx + 1) * max_pop
+    def deploy_worlds(self, world_count, scenario):
+        self.use_scenario(scenario)
+        positions = self.get_boid_positions(self.max_pop)
+        boids = self.entity_pool.acquire_boids(list(range(self.max_pop)) * world_count, positions * world_count)
+        self.boid_array = self.entity_pool.boid_array
+        self.flock_manager = FlockManager()
+        self.use_worlds(world_count)
+        for idx, world in enumerate(self.worlds):
+            world.flock_manager = self.flock_manager
+            world.use_scenario(scenario)
+            world.clear_population()
+            world.sim_score = 0
+            world.boid_array = self.boid_array
+            world.boid_list = boids[idx * self.max_pop:(idx + 1) * self.max_pop]
+            world.deploy_goals(self.goal_count)
+        self.world_of_slot = np.repeat(np.arange(world_count), self.max_pop)
+        self.playtime = 0
+        self.frame_timer.reset()
+
+    # Takes the first world_count worlds of the pool as the worlds of the batch, making more if there are not enough
+    def use_worlds(self, world_count):
+        while len(self.world_pool) < world_count:
+            self.world_pool.append(SimulationEngine(self.window_width, self.sim_area_height, self.FPS,
+                                                    self.boid_radius))
+        self.worlds = self.world_pool[:world_count]
+
+    # Returns the state of the batch being simulated, which load_batch continues from
+    def save_batch(self):
+        state = self.save_run()
+        state["world_of_slot"] = self.world_of_slot
+        state["worlds"] = [world.save_run() for world in self.worlds]
+        return state
+
+    def load_batch(self, state):
+        state = dict(state)
+        runs = state.pop("worlds")
+        self.world_of_slot = state.pop("world_of_slot")
+        state.pop("ended")
+        self.load_run(state)
+        self.use_worlds(len(runs))
+        for world, run in zip(self.worlds, runs):
+            world.load_run(run)
+
+    # Returns every living boid of the worlds in world order
+    def get_all_boids(self):
+        return [boid for world in self.worlds for boid in world.boid_list]
+
+    # Advances every world by one fixed time step. weights holds one row of cohesion, separation, alignment, goal
+    # seeking and wall avoidance genes per world
+    def step(self, weights):
+        self.playtime += self.time_step
+        self.step_number += 1
+        board_dims = (self.window_width, self.sim_area_height)
+        timer = self.frame_timer
+        timer.begin()
+
+        # Setup connections for every world at once, boids are only ever connected to boids of their own world
+        rows = np.array([boid.slot for boid in self.get_all_boids()], dtype=np.intp)
+        candidates = self.spatial_grid.candidate_matrix(self.boid_array.positions, rows, self.world_of_slot[rows])
+        self.boid_array.find_connections(rows, candidates, self.boid_radius * 16)
+        timer.lap("find_connections")
+
+        # Look for goals in every world at once, each boid searches the goal index of its own world
+        find_nearest_goals(self.boid_array, rows, [world.goal_index for world in self.worlds], self.world_of_slot[rows])
+        timer.lap("find_nearest_goal")
+
+        # Goal redeployment and deaths belong to each world, which handles the events of its own boids
+        events = self.boid_array.get_event_slots()
+        event_worlds = self.world_of_slot[events]
+        for idx, world in enumerate(self.worlds):
+            if not world.boid_list:
+                continue
+            world.playtime = self.playtime
+            world.sim_score = world.get_collisions(world.sim_score, events[event_worlds == idx])
+        timer.lap("get_collisions")
+
+        # Each boid is steered with the genes of its world, boids with the same id wander alike in every world
+        boids = self.get_all_boids()
+        rows = np.array([boid.slot for boid in boids], dtype=np.intp)
+        ids = np.array([boid.get_id() for boid in boids], dtype=np.intp)
+        steer_boids(self.boid_array, rows, self.flock_manager, board_dims, self.playtime,
+                    weights[self.world_of_slot[rows]], self.scenario.get_wander(self.step_number - 1, ids))
+        timer.lap("move_all_boids_genetic")
+
+        # Flocks never span worlds since no connection does
+        self.flock_manager.form_flocks(boids, self.boid_array.connection_edges)
+        timer.lap("form_flocks")
+        self.flock_manager.update_all_flock_data()
+        timer.lap("update_all_flock_data")
+
+    # Simulates every species of the list together to the end, returning the result of each like evaluate_species
+    def evaluate_batch(self, species_list, generation_number, scenario=None):
+        if scenario is None:
+            scenario = self.build_scenario(generation_number)
+        reached = self.advance_chunk(species_list, generation_number, scenario, None, None)[1]
+        return [point[:3] + (RAN_TO_END, ()) for point in reached]
+
+    # Continues the batch saved in state, or deploys one world per species of the list when state is None, until the
+    # simulated time reaches until or every world has ended. Returns the state to continue from, None once every world
+    # has ended, and for each world the fitness, time and survivors it reached followed by whether its run has ended
+    # Worlds that had already ended or were stopped reach None
+    def advance_chunk(self, species_list, generation_number, scenario, state, until):
+        if state is None:
+            for species in species_list:
+                print("Generation {} Species {}".format(generation_number, species.get_id()))
+            self.deploy_worlds(len(species_list), scenario)
+            ended = [False] * len(species_list)
+        else:
+            self.load_batch(state)
+            ended = list(state["ended"])
+        weights = np.array([[species.get_genome()[gene] for gene in range(5)] for species in species_list])
+        reached = [None] * len(species_list)
+        self.game_state = RUN_SIMULATION
+        while not all(ended):
+            if self.playtime > self.end_time:
+                for idx, world in enumerate(self.worlds):
+                    if not ended[idx]:
+                        reached[idx] = (world.current_fitness(), self.playtime, len(world.boid_list), True)
+                        ended[idx] = True
+                        print("Species {0:} ran for {1:.2f} seconds before being stopped".
+                              format(species_list[idx].get_id(), self.playtime))
+                break
+
+            if until is not None and self.playtime >= until:
+                break
+
+            self.step(weights)
+
+            # A world has ended when all of its boids are dead
+            for idx, world in enumerate(self.worlds):
+                if not ended[idx] and not world.boid_list:
+                    reached[idx] = (world.fitness_function(world.sim_score, world.boid_list), self.playtime, 0, True)
+                    ended[idx] = True
+                    print("Species {0:} ran for {1:.2f} seconds before all boids died".
+                          format(species_list[idx].get_id(), self.playtime))
+        if not all(ended):
+            for idx, world in enumerate(self.worlds):
+                if not ended[idx]:
+                    reached[idx] = (world.current_fitness(), self.playtime, len(world.boid_list), False)
+            state = self.save_batch()
+            state["ended"] = ended
+            return state, reached
+        self.game_state = END_SIMULATION
+        if species_list:
+            self.export_timings("gen_{}_species_{}-{}.json".format(generation_number, species_list[0].get_id(),
+                                                                   species_list[-1].get_id()),
+                                {"generation": generation_number,
+                                 "species": [species.get_id() for species in species_list],
+                                 "boids": self.max_pop * len(species_list), "playtime": self.playtime})
+        return None, reached
+
+    # Returns the entries of each chunk a race of species_count species is run in, which is one batch, or one batch per
+    # worker when an executor is passed
+    def get_race_chunks(self, species_count, executor=None):
+        chunk_count = 1 if executor is None else min(self.worker_count, species_count)
+        bounds = np.linspace(0, species_count, chunk_count + 1).astype(int)
+        return [list(range(start, end)) for start, end in zip(bounds[:-1], bounds[1:])]
+
+    # Stops the world at position in a saved batch, its boids are removed from the shared array
+    def stop_species(self, state, position):
+        run = state["worlds"][position]
+        for boid in run["boid_list"]:
+            boid.kill()
+        run["boid_list"] = []
+        state["ended"][position] = True
+
+    # Evaluates the whole generation as one batch, or as one batch per worker when an executor is passed
+    # on_result is called with the index and result of each species as soon as its batch is back
+    def evaluate_generation(self, species_list, generation_number, executor=None, on_result=None):
+        scenario = self.build_scenario(generation_number)
+        results = []
+        if executor is not None:
+            scenario.share()
+        try:
+            if executor is None:
+                batches = [self.evaluate_batch(species_list, generation_number, scenario)]
+            else:
+                bounds = np.linspace(0, len(species_list), min(self.worker_count, len(species_list)) + 1).astype(int)
+                chunks = [species_list[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+                batches = executor.map(evaluate_batch_in_worker, [self.get_settings()] * len(chunks), chunks,
+                                       [generation_number] * len(chunks), [scenario] * len(chunks),
+                                       [self.timing_directory] * len(chunks))
+            for batch in batches:
+                for result in batch:
+                    if on_result is not None:
+                        on_result(len(results), result)
+                    results.append(result)
+        finally:
+            if executor is not None:
+                scenario.release()
+        return results
+
+
+# Builds a headless batched engine from the passed settings and evaluates a chunk of species, used by worker processes
+def evaluate_batch_in_worker(settings, species_list, generation_number, scenario, timing_directory=None):
+    engine = BatchedSimulationEngine.from_settings(settings)
+    engine.set_timing_directory(timing_directory)
+    return engine.evaluate_batch(species_list, generation_number, scenario)
@@ -0,0 +1,35 @@
+"""
+Pyboids - Checkpoint
+ * Functions that save and load the state of a genetic run, so that a run that was stopped or crashed can be resumed
+ * from the last generation it completed
+ * Copyright (c) 2019 Meaj
+"""
+import os
+import pickle
+import tempfile
+
+CHECKPOINT_VERSION = 1
+
+
+# Writes the state to a temporary file next to path and moves it into place, so path always holds either the previous
+# checkpoint or the new one in full, never a partly written file
+def save_checkpoint(path, state):
+    directory = os.path.dirname(os.path.abspath(path))
+    handle, temp_path = tempfile.mkstemp(prefix=".checkpoint_", dir=directory)
+    try:
+        with os.fdopen(handle, "wb") as temp_file:
+            pickle.dump({"version": CHECKPOINT_VERSION, "state": state}, temp_file, pickle.HIGHEST_PROTOCOL)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def load_checkpoint(path):
+    with open(path, "rb") as checkpoint_file:
+        checkpoint = pickle.load(checkpoint_file)
+    if checkpoint.get("version") != CHECKPOINT_VERSION:
+        raise ValueError("{} is not a version {} checkpoint".format(path, CHECKPOINT_VERSION))
+    return checkpoint["state"]
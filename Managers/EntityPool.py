@@ -0,0 +1,53 @@
+"""
+Pyboids - EntityPool
+ * A class containing the definitions of the EntityPool object, which keeps the boids and goals of earlier populations
+ * so that deploying a new population or redeploying a goal resets entities instead of allocating them
+ * Copyright (c) 2019 Meaj
+"""
+from Entities.Entities import Boid, Goal
+from Entities.BoidArray import BoidArray
+
+
+class EntityPool:
+    def __init__(self, boid_radius):
+        self.boid_radius = boid_radius
+        self.boid_array = None     # Array every pooled boid is a view onto, its boids list holds the pooled boids
+        self.goals = []            # Goals that are out of play and can be handed out again
+        self.released_goals = []   # Goals taken out of play since the last call to recycle_goals
+
+    # Returns a population of boids with the passed ids at the passed positions, reusing the boids of the last
+    # population. The array is cleared first, so the population starts from the same state as newly made boids, and
+    # pooled boids that are not handed out are left dead
+    def acquire_boids(self, ids, positions):
+        if self.boid_array is None:
+            self.boid_array = BoidArray(len(positions), self.boid_radius)
+        boid_array = self.boid_array
+        boid_array.clear()
+        while boid_array.count < len(positions):
+            Boid(0, 0, 0, self.boid_radius, boid_array=boid_array)
+        boids = boid_array.boids[:len(positions)]
+        for boid, boid_id, (x, y) in zip(boids, ids, positions):
+            boid.reset(boid_id, x, y)
+        boid_array.alive[:len(boids)] = True
+        return boids
+
+    def acquire_goal(self, goal_id, x, y, radius):
+        if not self.goals:
+            return Goal(goal_id, x, y, radius)
+        goal = self.goals.pop()
+        goal.reset(goal_id, x, y, radius)
+        return goal
+
+    # Takes a redeployed goal out of play. Boids keep pointing at the goal they found until they next look for goals, so
+    # it is only handed out again after recycle_goals is called once they have
+    def release_goal(self, goal):
+        self.released_goals.append(goal)
+
+    def recycle_goals(self):
+        self.goals.extend(self.released_goals)
+        self.released_goals = []
+
+    # Takes every goal of a population that is no longer simulated out of play
+    def release_goals(self, goals):
+        self.released_goals.extend(goals)
+        self.recycle_goals()
@@ -0,0 +1,62 @@
+"""
+Pyboids - FitnessCache
+ * A class containing the definitions of the FitnessCache object, which remembers the result of every genome evaluated
+ * against a scenario so that a genome is never simulated twice under the same conditions
+ * Copyright (c) 2019 Meaj
+"""
+import shelve
+from collections import OrderedDict
+
+
+class FitnessCache:
+    def __init__(self, capacity=4096, path=None):
+        self.capacity = capacity   # Number of results kept in memory before the least recently used is dropped
+        self.entries = OrderedDict()
+        self.path = path           # File the persistent tier is kept in, None to only cache in memory
+        self.shelf = None
+        self.hits = 0
+        self.misses = 0
+        self.open()
+
+    # Opens the persistent tier if there is one and it is not already open, so a closed cache can be used again
+    def open(self):
+        if self.path is not None and self.shelf is None:
+            self.shelf = shelve.open(self.path)
+
+    # Results only depend on the genes, the scenario and the settings of the simulation, so together they are the key
+    @staticmethod
+    def make_key(genome, scenario_seed, settings):
+        return repr((tuple(float(genome[gene]) for gene in range(len(genome))), scenario_seed,
+                     tuple(sorted(settings.items()))))
+
+    # Returns the (fitness, live time, survivors, outcome, checkpoint points) stored under key, or None if the key has
+    # not been evaluated
+    def get(self, key):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        if self.shelf is not None and key in self.shelf:
+            self.hits += 1
+            result = self.shelf[key]
+            self.remember(key, result)
+            return result
+        self.misses += 1
+        return None
+
+    def put(self, key, result):
+        self.remember(key, result)
+        if self.shelf is not None:
+            self.shelf[key] = result
+
+    # Keeps the result in memory, dropping the least recently used result once the cache is full
+    def remember(self, key, result):
+        self.entries[key] = result
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def close(self):
+        if self.shelf is not None:
+            self.shelf.close()
+            self.shelf = None
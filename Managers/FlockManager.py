@@ -4,10 +4,35 @@ Pyboids - FlockManager
  * Copyright (c) 2019 Meaj
 """
 from Entities.Vector2D import Vector2D
+from Entities.BoidArray import calc_arguments
 import math
+import numpy as np
 from Constants import *
 
 
+# Labels the connected components of the graph with node_count nodes and the edges (edge_from[i], edge_to[i])
+# Labels are numbered 0, 1, 2... in order of the smallest node in each component, so they are stable between calls
+# Each pass hooks every node and its root onto the smallest label across its edges, then compresses the paths, which
+# is a union-find over the whole edge list at once and usually settles within a handful of passes
+def connected_components(node_count, edge_from, edge_to):
+    labels = np.arange(node_count)
+    while True:
+        low = np.minimum(labels[edge_from], labels[edge_to])
+        hooked = labels.copy()
+        for nodes in (edge_from, edge_to, labels[edge_from], labels[edge_to]):
+            np.minimum.at(hooked, nodes, low)
+        # Labels never exceed their own node, so following parents always terminates at a root
+        while True:
+            parents = hooked[hooked]
+            if np.array_equal(parents, hooked):
+                break
+            hooked = parents
+        if np.array_equal(hooked, labels):
+            break
+        labels = hooked
+    return np.unique(labels, return_inverse=True)[1]
+
+
 class Flock:
     def __init__(self, member_list=None):
         self.flock_members = member_list  # List of boids that are flock members
@@ -17,58 +42,15 @@ class Flock:
         self.flock_goal_dir = -1
         self.flock_score = 0              # The combined score of all members of the flock
 
-    # Calculates the position of centroids, the value of average thetas, and the scores for each flock
-    def update_flock_data(self):
-        sum_pos = Vector2D()
-        sum_vel = Vector2D(0, 0)
-        score = 0
-        goals = {}
-        # More nasty cross referencing, see update_flock_scores()
-        for member in self.flock_members:
-            sum_vel += member.get_velocity()
-            sum_pos += member.get_position()
-            score += member.get_score()
-            if member.nearest_goal not in goals:
-                if member.goal_dir != -1:
-                    goals.update({member.nearest_goal: 1})
-            elif member.nearest_goal in goals:
-                goals[member.nearest_goal] += 1
-
-        max_votes = -1
-        for vote in goals:
-            if goals[vote] > max_votes:
-                max_votes = goals[vote]
-                self.flock_goal = vote
-        # Append each new value so that the indexes for the data match those of the flocks
-        self.flock_centroid = sum_pos/len(self.flock_members)  # the average position of each boid
-        self.flock_velocity = sum_vel/len(self.flock_members)  # the average velocity of each boid
-        self.flock_score = score  # scores are aggregated from boids to account for changes in flock members
-
-        if max_votes != -1:
-            temp_theta = math.atan2(self.flock_centroid.y - self.flock_goal.pos.y,
-                                    self.flock_centroid.x - self.flock_goal.pos.x)
-            if temp_theta < 0:
-                temp_theta = abs(temp_theta)
-            else:
-                temp_theta = 2 * math.pi - temp_theta
-            self.flock_goal_dir = (math.degrees(temp_theta)-90) % 360
-
-    # Draws shapes representing the centroids of the flocks of boid objects as well as the velocity of the flocks
-    def display_flock_centroid_vectors(self, screen, background):
-        x = self.flock_centroid.x
-        y = self.flock_centroid.y
-        surface = pygame.Surface((6, 6))
-        surface.convert_alpha(surface)
-        surface.set_colorkey(BLACK)
-        pygame.draw.circle(surface, PURPLE, (3, 3), 3)
-        pygame.draw.line(background, RED, (x, y), (x + (self.flock_velocity.x * x / 16),
-                                                   y + (self.flock_velocity.y * y / 16)))
-        screen.blit(surface, (x, y))
-
 
 class FlockManager:
     def __init__(self):
         self.flock_list = []  # List of flocks formed each frame by manager
+        self.boid_array = None                    # BoidArray of the boids in the flocks
+        self.slots = np.zeros(0, dtype=np.intp)   # BoidArray slot of each boid passed to form_flocks
+        self.labels = np.zeros(0, dtype=np.intp)  # Index in flock_list of the flock each of those boids joined
+        self.velocity_arguments = np.zeros(0)     # Argument of the velocity of each flock, indexed by label
+        self.goal_dirs = np.zeros(0)              # flock_goal_dir of each flock, indexed by label
 
         # These are currently unused, but would control the flock size
         # Score should be updated such that when the number of flock members is under pref_flock_members the flock gets
@@ -81,56 +63,112 @@ class FlockManager:
     def get_flocks(self):
         return self.flock_list
 
+    # Returns the flock the boid joined the last time flocks were formed, or None if it has not joined one
+    def get_flock(self, boid):
+        if boid.boid_array is not self.boid_array:
+            return None
+        label = self.boid_array.flock_labels[boid.slot]
+        if label < 0:
+            return None
+        return self.flock_list[label]
+
     # Ensures that when a flock member collides with a goal, each member of the flock gets awarded some points
     def update_flock_score(self, boid):
         total = 0
         # First find the relevant flock
-        for flock in self.flock_list:
-            award = len(flock.flock_members) * 10
-            if boid in flock.flock_members:
-                # If the flock is too big, it won't score, so we can break
-                if self.max_flock_members <= len(flock.flock_members):
-                    break
-                # Next each member needs to be awarded
-                # Since FlockManager doesn't actually store boids, just their ids, we have to cross reference
-                # the list of boids passed in from the game manager. If we change the list to a dictionary we won't
-                # need to cross reference and lookup will be faster, but that may cause issues, hence the nastiness
-                for member in flock.flock_members:
-                    # Each boid is awarded points equal to either the length of the flock or the pref. flock
-                    # size, whichever is smaller. We also check to make sure the awards are in bounds
-                    if 0 <= len(flock.flock_members) < self.pref_flock_members:
-                        member.increment_score(award)
-                        total += award
-                    elif self.pref_flock_members <= len(flock.flock_members) < self.max_flock_members:
-                        member.increment_score(self.pref_flock_members * 10)
-                        total += self.pref_flock_members * 10
+        flock = self.get_flock(boid)
+        # If the flock is too big, it won't score
+        if flock is None or self.max_flock_members <= len(flock.flock_members):
+            return total
+        award = len(flock.flock_members) * 10
+        # Next each member needs to be awarded
+        for member in flock.flock_members:
+            # Each boid is awarded points equal to either the length of the flock or the pref. flock
+            # size, whichever is smaller. We also check to make sure the awards are in bounds
+            if 0 <= len(flock.flock_members) < self.pref_flock_members:
+                member.increment_score(award)
+                total += award
+            elif self.pref_flock_members <= len(flock.flock_members) < self.max_flock_members:
+                member.increment_score(self.pref_flock_members * 10)
+                total += self.pref_flock_members * 10
         return total
 
     # Calculates the position of centroids, the value of average thetas, and the scores for each flock
+    # Every flock is computed at once with sums grouped by flock label instead of walking the members of each flock
     def update_all_flock_data(self):
-        # Gather data for each flock
-        for flock in self.flock_list:
-            flock.update_flock_data()
+        self.velocity_arguments = np.zeros(len(self.flock_list))
+        self.goal_dirs = np.full(len(self.flock_list), -1.0)
+        if not self.flock_list:
+            return
+        labels = self.labels
+        flock_count = len(self.flock_list)
+        sizes = np.bincount(labels, minlength=flock_count)
+        positions = self.boid_array.positions[self.slots]
+        velocities = self.boid_array.velocities[self.slots]
+        centroid_x = np.bincount(labels, positions[:, 0], flock_count) / sizes
+        centroid_y = np.bincount(labels, positions[:, 1], flock_count) / sizes
+        velocity_x = np.bincount(labels, velocities[:, 0], flock_count) / sizes
+        velocity_y = np.bincount(labels, velocities[:, 1], flock_count) / sizes
+        self.velocity_arguments = calc_arguments(np.column_stack((velocity_x, velocity_y)))
+        scores = np.bincount(labels, self.boid_array.scores[self.slots], flock_count)
 
-    # calculates the number of flocks and stores their members as a list of lists
-    # When the boids move quickly, the flocks sometime do not make sense, this is being examined
-    def form_flocks(self, boids):
-        self.flock_list = []
-        flocks = []
-        for boid in boids:
-            # Extract all the boid IDs to the list of new connections, t_flock
-            t_flock = boid.get_connected_boids()
-            # Begin placing t_flock into flocks
-            # Check for overlap and add difference to connections before removing old flock
-            for flock in flocks:
-                overlap = set(flock.flock_members).intersection(set(t_flock))
-                if overlap:
-                    t_flock.extend(set(t_flock).union(set(flock.flock_members)))
-                    flocks.remove(flock)
-                    del flock
-            # Remove any lingering duplicates
-            t_flock = list(set(t_flock))
-            if t_flock not in flocks:
-                flocks.append(Flock(t_flock))
-        self.flock_list = flocks
+        # Each member that can see its nearest goal votes for it, the goal with the most votes becomes the flock goal
+        goal_ids = self.boid_array.goal_ids[self.slots]
+        voters = np.nonzero(goal_ids >= 0)[0]
+        goal_span = goal_ids.max(initial=-1) + 1
+        ballots, first_voter, votes = np.unique(labels[voters] * goal_span + goal_ids[voters],
+                                                return_index=True, return_counts=True)
+        winners = {}
+        for ballot, voter, count in zip(ballots, voters[first_voter], votes):
+            label = ballot // goal_span
+            if label not in winners or count > winners[label][1]:
+                winners[label] = (voter, count)
+
+        for label, flock in enumerate(self.flock_list):
+            flock.flock_centroid = Vector2D(float(centroid_x[label]), float(centroid_y[label]))
+            flock.flock_velocity = Vector2D(float(velocity_x[label]), float(velocity_y[label]))
+            flock.flock_score = int(scores[label])
+            if label in winners:
+                flock.flock_goal = self.boid_array.nearest_goals[self.slots[winners[label][0]]]
+                temp_theta = math.atan2(flock.flock_centroid.y - flock.flock_goal.pos.y,
+                                        flock.flock_centroid.x - flock.flock_goal.pos.x)
+                if temp_theta < 0:
+                    temp_theta = abs(temp_theta)
+                else:
+                    temp_theta = 2 * math.pi - temp_theta
+                flock.flock_goal_dir = (math.degrees(temp_theta) - 90) % 360
+                self.goal_dirs[label] = flock.flock_goal_dir
+
+    # Calculates the number of flocks and stores their members as a list of lists
+    # Flocks are the connected components of the connection graph, edges is a pair of arrays holding the BoidArray
+    # slots of each connection, as kept in BoidArray.connection_edges
+    def form_flocks(self, boids, edges):
+        # Translate slots to positions in boids, dropping connections to boids that are no longer in the list
+        slots = np.array([boid.slot for boid in boids], dtype=np.intp)
+        position = np.full(max(slots.max(initial=-1), edges[0].max(initial=-1), edges[1].max(initial=-1)) + 1,
+                           -1, dtype=np.intp)
+        position[slots] = np.arange(len(boids))
+        edge_from = position[edges[0]]
+        edge_to = position[edges[1]]
+        kept = (edge_from >= 0) & (edge_to >= 0)
+        edge_from = edge_from[kept]
+        edge_to = edge_to[kept]
 
+        self.assign_flocks(boids, connected_components(len(boids), edge_from, edge_to))
+
+    # Groups the boids into flocks by label, labels[i] is the index in flock_list of the flock that boids[i] joins
+    # Labels must run from 0 to the number of flocks - 1, as they do when recorded from form_flocks
+    def assign_flocks(self, boids, labels):
+        self.labels = labels
+        self.slots = np.array([boid.slot for boid in boids], dtype=np.intp)
+        self.boid_array = boids[0].boid_array if boids else None
+        if self.boid_array is not None:
+            self.boid_array.flock_labels[:] = -1
+            self.boid_array.flock_labels[self.slots] = labels
+        order = np.argsort(labels, kind="stable")
+        bounds = np.cumsum(np.bincount(labels, minlength=labels.max(initial=-1) + 1))
+        self.flock_list = []
+        start = 0
+        for end in bounds:
+            self.flock_list.append(Flock([boids[idx] for idx in order[start:end]]))
+            start = end
@@ -0,0 +1,122 @@
+"""
+Pyboids - FlockMonitor
+ * A class containing the definitions of the FlockMonitor object, which draws the flock data panel under the simulation
+ * area. The panel is only redrawn a few times a second and only the rows scrolled into view are formatted and drawn,
+ * so its cost does not grow with the number of flocks
+ * Copyright (c) 2019 Meaj
+"""
+import time
+import itertools
+import pygame
+from collections import OrderedDict
+from Constants import *
+
+HEADER = "Number  |     Centroids    |  Direction  |  Goal Direction  |  Score  |  Members"
+
+
+class FlockMonitor:
+    def __init__(self, font, width, height, refresh_rate=4, row_height=13, text_capacity=512):
+        self.font = font
+        self.width = width
+        self.height = height
+        self.refresh_rate = refresh_rate        # Times a second the rows are redrawn, 0 to redraw them every frame
+        self.row_height = row_height
+        self.visible_rows = max(0, height // row_height - 1)  # Rows that fit under the header
+        self.scroll_offset = 0                  # Index of the flock in the top visible row
+        self.last_refresh = None                # time.perf_counter() of the last redraw, None to redraw next frame
+
+        # Text is drawn from single glyphs when the font is monospaced, so any number can be drawn from a few surfaces
+        # Other fonts fall back to caching the surface of each piece of text, dropping the least recently used
+        self.glyph_width = font.size("W")[0]
+        self.monospaced = font.size("i")[0] == self.glyph_width
+        self.glyphs = {}
+        self.text_capacity = text_capacity
+        self.texts = OrderedDict()
+        self.line_length = max(1, (width - 12) // max(1, self.glyph_width))  # Characters that fit on a row
+
+        self.panel = pygame.Surface((width, height)).convert()
+        self.template = self.panel.copy()       # The panel with only the header and row separators drawn
+        self.template.fill(BLACK)
+        self.template.blit(self.render_text(HEADER), (11, 0))
+        for row in range(1, self.visible_rows + 2):
+            pygame.draw.line(self.template, GREEN, (0, row * row_height), (width, row * row_height))
+
+    def set_refresh_rate(self, refresh_rate):
+        self.refresh_rate = refresh_rate
+        self.invalidate()
+
+    # Redraws the rows on the next frame regardless of the refresh rate
+    def invalidate(self):
+        self.last_refresh = None
+
+    # Moves the view by the passed number of rows, negative to scroll up
+    def scroll(self, rows, flock_count):
+        offset = min(max(0, self.scroll_offset + rows), max(0, flock_count - self.visible_rows))
+        if offset != self.scroll_offset:
+            self.scroll_offset = offset
+            self.invalidate()
+
+    def get_glyph(self, char):
+        if char not in self.glyphs:
+            self.glyphs[char] = self.font.render(char, True, GREEN)
+        return self.glyphs[char]
+
+    def get_text(self, string):
+        if string in self.texts:
+            self.texts.move_to_end(string)
+        else:
+            self.texts[string] = self.font.render(string, True, GREEN)
+            while len(self.texts) > self.text_capacity:
+                self.texts.popitem(last=False)
+        return self.texts[string]
+
+    # Returns a new surface holding string, used for text that is drawn once
+    def render_text(self, string):
+        return self.font.render(string, True, GREEN)
+
+    # Draws string onto the panel at pos
+    def draw_text(self, string, pos):
+        if self.monospaced:
+            x, y = pos
+            self.panel.blits([(self.get_glyph(char), (x + idx * self.glyph_width, y))
+                              for idx, char in enumerate(string) if char != " "], False)
+        else:
+            self.panel.blit(self.get_text(string), pos)
+
+    # Lists as many member ids as fit on the rest of the row, the full list of a large flock is never built
+    def format_members(self, flock, space):
+        members = []
+        length = 2
+        for member in itertools.islice(flock.flock_members, max(0, space // 3)):
+            text = str(member.get_id())
+            length += len(text) + 2
+            if length > space:
+                break
+            members.append(text)
+        if len(members) < len(flock.flock_members):
+            members.append("...")
+        return "[" + ", ".join(members) + "]"
+
+    def format_row(self, number, flock):
+        cent = "{:3.2f}, {:3.2f}".format(flock.flock_centroid.x, flock.flock_centroid.y)
+        string = "{0:^6}{1:^5s}{2:^15}{1:^4s}{3:^10.2f}{1:^4s}{4:^14.2f}{1:^5s}{5:^6d}{1:^4s}".\
+            format(number, "|", cent, flock.flock_velocity.argument(), flock.flock_goal_dir, flock.flock_score)
+        return string + self.format_members(flock, self.line_length - len(string))
+
+    # Returns the panel for the passed flocks, redrawing the visible rows if the refresh interval has passed
+    def get_panel(self, flocks, now=None):
+        now = time.perf_counter() if now is None else now
+        if self.last_refresh is not None and self.refresh_rate and now - self.last_refresh < 1 / self.refresh_rate:
+            return self.panel
+        self.last_refresh = now
+
+        # Flocks merge and split between refreshes, so the view is kept inside the current list
+        self.scroll_offset = min(self.scroll_offset, max(0, len(flocks) - self.visible_rows))
+        self.panel.blit(self.template, (0, 0))
+        end = min(len(flocks), self.scroll_offset + self.visible_rows)
+        for row, idx in enumerate(range(self.scroll_offset, end)):
+            self.draw_text(self.format_row(idx + 1, flocks[idx]), (12, (row + 1) * self.row_height))
+        if len(flocks) > self.visible_rows:
+            self.draw_text("{}-{} of {}".format(self.scroll_offset + 1, end, len(flocks)),
+                           (self.width - 12 * self.glyph_width, 0))
+        return self.panel
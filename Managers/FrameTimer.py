@@ -0,0 +1,66 @@
+"""
+Pyboids - FrameTimer
+ * A class containing the definitions of the FrameTimer object, which times each phase of a frame and keeps a rolling
+ * window of the timings so that percentiles can be shown while the simulation runs
+ * Copyright (c) 2019 Meaj
+"""
+import json
+import time
+import numpy as np
+
+PHASES = ("find_connections", "find_nearest_goal", "get_collisions", "move_all_boids_genetic", "form_flocks",
+          "update_all_flock_data", "draw_simulation_screen")
+
+
+class FrameTimer:
+    def __init__(self, window=300):
+        self.window = window  # Number of most recent timings each percentile is taken over
+        self.samples = {}     # Ring buffer of the most recent timings of each phase, in seconds
+        self.counts = {}      # Number of timings taken of each phase since the last reset
+        self.totals = {}      # Sum of the timings taken of each phase since the last reset
+        self.mark = 0.0
+        self.reset()
+
+    def reset(self):
+        for phase in PHASES:
+            self.samples[phase] = np.zeros(self.window)
+            self.counts[phase] = 0
+            self.totals[phase] = 0.0
+
+    # Starts timing the first phase of a frame
+    def begin(self):
+        self.mark = time.perf_counter()
+
+    # Records the time since the last begin or lap as a timing of phase and starts timing the next phase
+    def lap(self, phase):
+        now = time.perf_counter()
+        elapsed = now - self.mark
+        self.mark = now
+        self.samples[phase][self.counts[phase] % self.window] = elapsed
+        self.counts[phase] += 1
+        self.totals[phase] += elapsed
+
+    # Returns the passed percentiles of the recent timings of phase in milliseconds, or None if it was never timed
+    def get_percentiles(self, phase, percentiles=(50, 95, 99)):
+        count = min(self.counts[phase], self.window)
+        if count == 0:
+            return None
+        return np.percentile(self.samples[phase][:count], percentiles) * 1000
+
+    # Returns the timings of every phase that was timed, in milliseconds
+    def get_summary(self):
+        summary = {}
+        for phase in PHASES:
+            if self.counts[phase] == 0:
+                continue
+            p50, p95, p99 = self.get_percentiles(phase)
+            summary[phase] = {"frames": self.counts[phase], "mean_ms": self.totals[phase] / self.counts[phase] * 1000,
+                              "p50_ms": p50, "p95_ms": p95, "p99_ms": p99, "total_ms": self.totals[phase] * 1000}
+        return summary
+
+    # Writes the summary as JSON along with anything in details, such as the generation and species that were timed
+    def export(self, path, details=None):
+        report = dict(details or {})
+        report["phases"] = self.get_summary()
+        with open(path, "w") as report_file:
+            json.dump(report, report_file, indent=2)
@@ -0,0 +1,66 @@
+"""
+Pyboids - GeneticHistory
+ * A class containing the definitions of the GeneticHistoryWriter object, which streams one fixed width record per
+ * evaluated species to a binary file that can be memory mapped and read by column, along with functions to load
+ * and export that file
+ * Copyright (c) 2019 Meaj
+"""
+import os
+import numpy as np
+
+HISTORY_MAGIC = b"PYBOIDSH"
+HISTORY_VERSION = 1
+HISTORY_HEADER = np.dtype([("magic", "S8"), ("version", "<u4"), ("record_size", "<u4")])
+GENE_NAMES = ("cohesion", "separation", "alignment", "goal_seeking", "wall_avoidance", "divergence")
+HISTORY_DTYPE = np.dtype([("generation", "<i4"), ("species", "<i4")] + [(name, "<f8") for name in GENE_NAMES] +
+                         [("fitness", "<f8"), ("live_time", "<f8"), ("survivors", "<i4")])
+
+
+class GeneticHistoryWriter:
+    # Opens the history file for appending, a file that already holds records keeps the first keep_count of them
+    # so that a resumed run drops any records written after its checkpoint
+    def __init__(self, path, keep_count=None):
+        self.path = path
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            with open(path, "wb") as history_file:
+                header = np.array((HISTORY_MAGIC, HISTORY_VERSION, HISTORY_DTYPE.itemsize), dtype=HISTORY_HEADER)
+                history_file.write(header.tobytes())
+        self.count = (os.path.getsize(path) - HISTORY_HEADER.itemsize) // HISTORY_DTYPE.itemsize
+        if keep_count is not None and keep_count < self.count:
+            self.count = keep_count
+        with open(path, "r+b") as history_file:
+            history_file.truncate(HISTORY_HEADER.itemsize + self.count * HISTORY_DTYPE.itemsize)
+        self.history_file = open(path, "ab")
+
+    # Appends the record of one evaluated species, genes are copied so later changes to the genome never reach it
+    def append(self, generation, species_id, genome, fitness, live_time, survivors):
+        record = np.array((generation, species_id) + tuple(float(genome[gene]) for gene in range(len(GENE_NAMES))) +
+                          (fitness, live_time, survivors), dtype=HISTORY_DTYPE)
+        self.history_file.write(record.tobytes())
+        self.history_file.flush()
+        self.count += 1
+
+    def close(self):
+        self.history_file.close()
+
+
+# Maps the records of a history file without reading them, each column is available by name, e.g. records["fitness"]
+def load_history(path):
+    header = np.fromfile(path, dtype=HISTORY_HEADER, count=1)
+    if len(header) == 0 or header["magic"][0] != HISTORY_MAGIC or header["version"][0] != HISTORY_VERSION:
+        raise ValueError("{} is not a version {} genetic history file".format(path, HISTORY_VERSION))
+    if os.path.getsize(path) == HISTORY_HEADER.itemsize:
+        return np.zeros(0, dtype=HISTORY_DTYPE)
+    return np.memmap(path, dtype=HISTORY_DTYPE, mode="r", offset=HISTORY_HEADER.itemsize)
+
+
+# Writes the records of a history file in the semicolon separated text format of the genetic history logs
+def export_history_text(path, text_path):
+    records = load_history(path)
+    with open(text_path, "w") as text_file:
+        text_file.write("Generation;Species;Chromosome;Performance;Live Time;Survivors\n")
+        for record in records:
+            text_file.write("{};{};[{}];{};{};{}\n".format(int(record["generation"]), int(record["species"]),
+                                                          ", ".join(str(float(record[name])) for name in GENE_NAMES),
+                                                          float(record["fitness"]), float(record["live_time"]),
+                                                          int(record["survivors"])))
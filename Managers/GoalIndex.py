@@ -0,0 +1,123 @@
+"""
+Pyboids - GoalIndex
+ * A class containing the definitions of the GoalIndex object, a uniform grid of goals used to find the nearest goal
+ * a boid can see without checking every goal
+ * Copyright (c) 2019 Meaj
+"""
+import math
+import numpy as np
+from Entities.BoidArray import visibility_kernel
+from Managers.SpatialGrid import gather_runs
+
+
+class GoalIndex:
+    def __init__(self, width, height, goal_number):
+        # Cells are sized so that each holds about one goal, which keeps both sparse and dense scenarios cheap
+        self.cell_size = max(1.0, math.sqrt(width * height / max(1, goal_number)))
+        self.max_ring = int(max(width, height) // self.cell_size) + 1  # Rings needed to cover the whole area
+        self.columns = int(width // self.cell_size) + 1                # Columns and rows of cells covering the area
+        self.rows = int(height // self.cell_size) + 1
+        self.fallback_id = goal_number - 1  # Id of the goal kept unless a closer one is visible, the last in goal_list
+        self.cells = {}       # Maps (column, row) to the list of goals inside that cell
+        self.goal_cells = {}  # Maps goal ids to the cell their goal is stored in
+        self.layout = None    # Goals sorted by cell as returned by get_layout, rebuilt after goals are moved
+
+    # Returns the (column, row) of the cell containing the passed coordinates
+    def get_cell(self, x, y):
+        return (min(max(int(x // self.cell_size), 0), self.columns - 1),
+                min(max(int(y // self.cell_size), 0), self.rows - 1))
+
+    def insert(self, goal):
+        cell = self.get_cell(goal.pos.x, goal.pos.y)
+        if cell in self.cells:
+            self.cells[cell].append(goal)
+        else:
+            self.cells[cell] = [goal]
+        self.goal_cells[goal.get_id()] = cell
+        self.layout = None
+
+    def remove(self, goal_id):
+        cell = self.goal_cells.pop(goal_id)
+        self.cells[cell] = [goal for goal in self.cells[cell] if goal.get_id() != goal_id]
+        self.layout = None
+
+    # Swaps out the goal sharing the id of the passed goal, used when a touched goal is redeployed
+    def replace(self, goal):
+        if goal.get_id() in self.goal_cells:
+            self.remove(goal.get_id())
+        self.insert(goal)
+
+    # Returns the goals sorted by cell, keeping the order they were added to each cell in, along with the start and
+    # count of the run of goals in each cell. Cell (column, row) is found at column * self.rows + row
+    def get_layout(self):
+        if self.layout is None:
+            keys = sorted((col * self.rows + row, (col, row)) for col, row in self.cells)
+            goals = [goal for key, cell in keys for goal in self.cells[cell]]
+            counts = np.zeros(self.columns * self.rows, dtype=np.intp)
+            for key, cell in keys:
+                counts[key] = len(self.cells[cell])
+            self.layout = (goals, np.cumsum(counts) - counts, counts)
+        return self.layout
+
+    # Returns the cells at a chebyshev distance of ring from the passed cell
+    @staticmethod
+    def ring_cells(cell, ring):
+        if ring == 0:
+            return [cell]
+        cells = []
+        for offset in range(-ring, ring + 1):
+            cells.append((cell[0] + offset, cell[1] - ring))
+            cells.append((cell[0] + offset, cell[1] + ring))
+        for offset in range(-ring + 1, ring):
+            cells.append((cell[0] - ring, cell[1] + offset))
+            cells.append((cell[0] + ring, cell[1] + offset))
+        return cells
+
+
+# Finds the nearest goal of every boid in rows at once and stores it in boid_array. goal_indexes holds the index of each
+# world, all covering the same area, and groups the world of each boid, every boid is in the first world if it is None
+# The fallback goal of a world is kept unless a visible goal is strictly closer, and rings of cells are searched
+# outwards until no unsearched cell can hold anything closer than the best goal of each boid. Goals are compared in
+# the order rings, cells and goals were added, so ties always go to the same goal
+def find_nearest_goals(boid_array, rows, goal_indexes, groups=None):
+    rows = np.asarray(rows, dtype=np.intp)
+    groups = np.zeros(len(rows), dtype=np.intp) if groups is None else np.asarray(groups, dtype=np.intp)
+    index = goal_indexes[0]
+
+    # The goals of every world are laid out one after the other, as are the cells
+    layouts = [goal_index.get_layout() for goal_index in goal_indexes]
+    goal_offsets = np.cumsum([0] + [len(layout[0]) for layout in layouts])
+    goals = np.empty(goal_offsets[-1], dtype=object)
+    goals[:] = [goal for layout in layouts for goal in layout[0]]
+    starts = np.concatenate([layout[1] + offset for layout, offset in zip(layouts, goal_offsets)])
+    counts = np.concatenate([layout[2] for layout in layouts])
+    targets = np.array([(goal.pos.x, goal.pos.y) for goal in goals])
+    ids = np.array([goal.get_id() for goal in goals], dtype=np.intp)
+    fallbacks = np.nonzero(ids == index.fallback_id)[0]
+    positions = boid_array.positions[rows]
+    cells = np.clip(np.floor(positions / index.cell_size).astype(np.intp), 0, (index.columns - 1, index.rows - 1))
+    cell_keys = groups * (index.columns * index.rows) + cells[:, 0] * index.rows + cells[:, 1]
+
+    nearest = fallbacks[groups]
+    best_dist = np.hypot(positions[:, 0] - targets[nearest, 0], positions[:, 1] - targets[nearest, 1])
+    searching = np.arange(len(rows))
+    for ring in range(0, index.max_ring + 1):
+        searching = searching[(ring - 1) * index.cell_size < best_dist[searching]]
+        if len(searching) == 0:
+            break
+        offsets = np.array(GoalIndex.ring_cells((0, 0), ring), dtype=np.intp)
+        ring_columns = cells[searching, 0][:, None] + offsets[:, 0]
+        ring_rows = cells[searching, 1][:, None] + offsets[:, 1]
+        inside = (ring_columns >= 0) & (ring_columns < index.columns) & (ring_rows >= 0) & (ring_rows < index.rows)
+        keys = np.where(inside, cell_keys[searching][:, None] + offsets[:, 0] * index.rows + offsets[:, 1], 0)
+        candidates = gather_runs(starts[keys], np.where(inside, counts[keys], 0), np.arange(len(goals)))
+        if candidates.shape[1] == 0:
+            continue
+        dist, bearing, visible, connected, colliding = visibility_kernel(boid_array.positions, boid_array.headings,
+                                                                         rows[searching], candidates, 0, 0, targets)
+        closer = np.where(visible & (dist < best_dist[searching, None]), dist, np.inf)
+        best = np.argmin(closer, axis=1)
+        found = np.nonzero(np.isfinite(closer[np.arange(len(searching)), best]))[0]
+        nearest[searching[found]] = candidates[found, best[found]]
+        best_dist[searching[found]] = closer[found, best[found]]
+    boid_array.set_nearest_goals(rows, goals[nearest], targets[nearest], ids[nearest])
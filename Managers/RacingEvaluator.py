@@ -0,0 +1,99 @@
+"""
+Pyboids - RacingEvaluator
+ * A class containing the definitions of the RacingEvaluator and Race objects, which compare the partial fitness of the
+ * species of a generation at checkpoints through the run and stop the species that are sure to make the top half or can
+ * no longer reach it, so that the rest of the run is only spent on the species near the cutoff
+ * Copyright (c) 2019 Meaj
+"""
+import numpy as np
+from Constants import RAN_TO_END, OUT_OF_CONTENTION, SURE_TO_SURVIVE
+
+
+class RacingEvaluator:
+    def __init__(self, fractions=(0.25, 0.5, 0.75), margin=1.0):
+        self.fractions = tuple(sorted(fractions))  # Fractions of the end time at which partial fitness is compared
+        self.margin = margin                       # Number of median absolute deviations a species must be clear by
+
+    # Returns the simulated times of the checkpoints of a run lasting end_time seconds
+    def get_checkpoint_times(self, end_time):
+        return [fraction * end_time for fraction in self.fractions]
+
+    # Returns {index: outcome} for the running entries of scores that are decided at a checkpoint
+    # scores holds the fitness of every species not yet decided, those whose run ended hold their final fitness, and
+    # places is the number of places in the top half not yet taken by species sure to survive. A running species is
+    # decided once its score is more than margin median absolute deviations clear of the cutoff for those places
+    def judge(self, scores, running, places):
+        scores = np.asarray(scores, dtype=float)
+        running = np.nonzero(np.asarray(running, dtype=bool))[0].tolist()
+        if places <= 0:
+            return dict.fromkeys(running, OUT_OF_CONTENTION)
+        if places >= len(scores):
+            return dict.fromkeys(running, SURE_TO_SURVIVE)
+        ranked = np.sort(scores)[::-1]
+        spread = self.margin * np.median(np.abs(scores - np.median(scores)))
+        outcomes = {}
+        for idx in running:
+            if scores[idx] - ranked[places] > spread:
+                outcomes[idx] = SURE_TO_SURVIVE
+            elif ranked[places - 1] - scores[idx] > spread:
+                outcomes[idx] = OUT_OF_CONTENTION
+        return outcomes
+
+
+# A race between the species of a generation. Each entry is a genome shared by one or more species of the generation
+# Entries without a known result are simulated, the engine records the point each one reaches at every checkpoint.
+# Known results are replayed through the points they reached, so the race is judged the same as if they were simulated
+# Results are (fitness, live time, survivors, outcome, points reached at each checkpoint)
+class Race:
+    def __init__(self, racing, end_time, known, copies):
+        self.racing = racing
+        self.checkpoint_times = racing.get_checkpoint_times(end_time)
+        self.copies = copies  # Number of species of the generation sharing each entry
+        self.survivor_count = sum(copies) - sum(copies) // 2  # Number of species cull_bottom_half keeps
+        self.points = []  # (fitness, live time, survivors) of each entry at every checkpoint it reached while running
+        self.finals = []  # (fitness, live time, survivors) of each entry whose run ended, None until then
+        self.forced = []  # Outcome of each known entry that was stopped early, given again at its last checkpoint
+        self.results = [None] * len(known)  # Result of each entry once it is settled
+        for result in known:
+            self.points.append([] if result is None else list(result[4]))
+            self.finals.append(None if result is None or result[3] != RAN_TO_END else tuple(result[:3]))
+            self.forced.append(None if result is None or result[3] == RAN_TO_END else result[3])
+
+    # Records the point a simulated entry reached at the next checkpoint, or at the end of its run once it has ended
+    def record(self, entry, fitness, live_time, survivors, ended):
+        if ended:
+            self.finals[entry] = (fitness, live_time, survivors)
+        else:
+            self.points[entry].append((fitness, live_time, survivors))
+
+    # Judges the race once every running entry has reached the checkpoint, and returns each entry settled there with its
+    # result in entry order. An entry is settled when it is decided or when its run has ended
+    def judge(self, checkpoint):
+        entries = [entry for entry, result in enumerate(self.results) if result is None or result[3] == RAN_TO_END]
+        running = [self.results[entry] is None and len(self.points[entry]) > checkpoint for entry in entries]
+        scores = [self.points[entry][checkpoint][0] if len(self.points[entry]) > checkpoint else self.finals[entry][0]
+                  for entry in entries]
+        places = self.survivor_count - sum(copies for copies, result in zip(self.copies, self.results)
+                                           if result is not None and result[3] == SURE_TO_SURVIVE)
+        # Every species sharing an entry has its score, so they are all decided alike
+        species = np.repeat(np.arange(len(entries)), [self.copies[entry] for entry in entries])
+        decided = self.racing.judge([scores[idx] for idx in species], [running[idx] for idx in species], places)
+        outcomes = {entries[species[idx]]: outcome for idx, outcome in decided.items()}
+        for entry, is_running in zip(entries, running):
+            if is_running and self.forced[entry] is not None:
+                outcomes.pop(entry, None)
+                if len(self.points[entry]) == checkpoint + 1:
+                    outcomes[entry] = self.forced[entry]
+        settled = []
+        for entry, result in enumerate(self.results):
+            if result is not None:
+                continue
+            if entry in outcomes:
+                self.results[entry] = self.points[entry][checkpoint] + (outcomes[entry],
+                                                                        tuple(self.points[entry][:checkpoint + 1]))
+            elif self.finals[entry] is not None and len(self.points[entry]) <= checkpoint + 1:
+                self.results[entry] = self.finals[entry] + (RAN_TO_END, tuple(self.points[entry]))
+            else:
+                continue
+            settled.append((entry, self.results[entry]))
+        return settled
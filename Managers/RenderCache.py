@@ -0,0 +1,28 @@
+"""
+Pyboids - RenderCache
+ * A class containing the definitions of the RenderCache object, which builds the surfaces used to draw boids once so
+ * that drawing a frame only blits them
+ * Copyright (c) 2019 Meaj
+"""
+import pygame
+from Constants import *
+
+
+class RenderCache:
+    def __init__(self, boid_image, angle_step=1):
+        self.angle_step = angle_step  # Headings are rounded to the nearest multiple of this many degrees
+        # The boid sprite rotated to every rounded heading, indexed by heading / angle_step. Sprites are converted to
+        # the format of the display, which needs the display mode to be set first, so that blitting them is fast
+        self.boid_sprites = [pygame.transform.rotozoom(boid_image, idx * angle_step, 1).convert_alpha()
+                             for idx in range(int(round(360 / angle_step)))]
+        self.label_font = pygame.font.SysFont('mono', 10, bold=False)
+        self.labels = {}  # Rendered id label of each boid, built the first time the id is drawn
+
+    # Returns the boid sprite rotated to the heading nearest to angle
+    def get_boid_sprite(self, angle):
+        return self.boid_sprites[int(round(angle / self.angle_step)) % len(self.boid_sprites)]
+
+    def get_label(self, entity_id):
+        if entity_id not in self.labels:
+            self.labels[entity_id] = self.label_font.render(str(entity_id), True, (0, 255, 0))
+        return self.labels[entity_id]
@@ -0,0 +1,123 @@
+"""
+Pyboids - Renderer
+ * A class containing the definitions of the Renderer object, which draws the simulation with batched blits of
+ * pre-built sprites and only pushes the regions of the screen that changed to the display
+ * Copyright (c) 2019 Meaj
+"""
+import math
+import pygame
+import numpy as np
+from Constants import *
+
+
+class Renderer:
+    def __init__(self, screen, background, render_cache):
+        self.screen = screen
+        self.background = background      # Static backdrop, restored over everything drawn the frame before
+        self.render_cache = render_cache  # Pre-rotated boid sprites and id labels
+        self.background_lines = []        # (colour, start, end) of each line drawn onto the backdrop
+        self.goal_sprites = {}            # Goal sprite of each goal radius, built the first time it is drawn
+        self.centroid_sprite = self.make_circle_sprite(PURPLE, 3)
+        self.dirty = []                   # Rects of the screen drawn over this frame
+        self.last_dirty = []              # Rects drawn over the frame before, erased at the start of this one
+        self.full_redraw = True           # The whole screen is redrawn and pushed on the next frame when True
+        self.redrawing_all = True         # True while the current frame is being redrawn in full
+        # Once the dirty rects cover this much of the screen, redrawing all of it is cheaper than restoring each rect
+        self.full_redraw_area = screen.get_width() * screen.get_height() / 2
+
+    @staticmethod
+    def make_circle_sprite(colour, radius):
+        sprite = pygame.Surface((radius * 2, radius * 2)).convert()
+        sprite.fill(BLACK)
+        sprite.set_colorkey(BLACK)
+        pygame.draw.circle(sprite, colour, (radius, radius), radius)
+        return sprite
+
+    # Adds a line that is part of the backdrop, such as the borders of the simulation area
+    def add_background_line(self, colour, start, end):
+        self.background_lines.append((colour, start, end))
+        self.reset()
+
+    # Redraws the whole screen on the next frame, needed whenever something else has drawn over the screen
+    def reset(self):
+        self.full_redraw = True
+
+    @staticmethod
+    def get_area(rects):
+        return sum(rect.width * rect.height for rect in rects)
+
+    # Erases everything drawn the frame before by restoring the backdrop behind it
+    def begin_frame(self):
+        if self.full_redraw:
+            self.background.fill(BLACK)
+            for colour, start, end in self.background_lines:
+                pygame.draw.line(self.background, colour, start, end)
+        self.redrawing_all = self.full_redraw or self.get_area(self.last_dirty) > self.full_redraw_area
+        if self.redrawing_all:
+            self.screen.blit(self.background, (0, 0))
+        else:
+            self.screen.blits([(self.background, rect, rect) for rect in self.last_dirty], False)
+        self.full_redraw = False
+        self.dirty = []
+
+    # Pushes the regions drawn this frame and the regions erased from the frame before to the display
+    def end_frame(self):
+        if self.redrawing_all or self.get_area(self.dirty) > self.full_redraw_area:
+            pygame.display.flip()
+        else:
+            pygame.display.update(self.last_dirty + self.dirty)
+        self.last_dirty = self.dirty
+
+    def blit(self, surface, dest):
+        rect = self.screen.blit(surface, dest)
+        self.dirty.append(rect)
+        return rect
+
+    # Blits every (surface, dest) pair of the sequence in one call
+    def blit_many(self, sequence):
+        if sequence:
+            self.dirty.extend(self.screen.blits(sequence))
+
+    # Draws every boid in one batch from the pre-rotated sprites, along with their view arcs and ids if draw_details
+    def draw_boids(self, boids, draw_details):
+        if not boids:
+            return
+        boid_array = boids[0].boid_array
+        slots = np.array([boid.slot for boid in boids], dtype=np.intp)
+        positions = boid_array.positions[slots].tolist()
+        headings = boid_array.headings[slots].tolist()
+        sequence = []
+        for (x, y), heading in zip(positions, headings):
+            sprite = self.render_cache.get_boid_sprite(heading)
+            sequence.append((sprite, sprite.get_rect(center=(x, y))))
+        self.blit_many(sequence)
+        if not draw_details:
+            return
+        labels = []
+        for boid, (x, y), heading in zip(boids, positions, headings):
+            start = math.radians(heading - 135 + 90)
+            end = math.radians(heading + 135 + 90)
+            for colour, size in ((RED, boid.too_close), (GOLD, boid.too_far)):
+                arc_rect = pygame.Rect(0, 0, size, size)
+                arc_rect.center = (x, y)
+                self.dirty.append(pygame.draw.arc(self.screen, colour, arc_rect, start, end))
+            labels.append((self.render_cache.get_label(boid.entity_id), (x, y)))
+        self.blit_many(labels)
+
+    # Draws every goal from a pre-built sprite, with the top left of the sprite at the goal's position
+    def draw_goals(self, goals):
+        sequence = []
+        for goal in goals:
+            if goal.radius not in self.goal_sprites:
+                self.goal_sprites[goal.radius] = self.make_circle_sprite(GOLD, goal.radius)
+            sequence.append((self.goal_sprites[goal.radius], (goal.pos.x, goal.pos.y)))
+        self.blit_many(sequence)
+
+    # Draws the centroid and velocity vector of every flock
+    def draw_centroids(self, flocks):
+        self.blit_many([(self.centroid_sprite, (flock.flock_centroid.x, flock.flock_centroid.y)) for flock in flocks])
+        for flock in flocks:
+            x = flock.flock_centroid.x
+            y = flock.flock_centroid.y
+            self.dirty.append(pygame.draw.line(self.screen, RED, (x, y), (x + (flock.flock_velocity.x * x / 16),
+                                                                          y + (flock.flock_velocity.y * y / 16))))
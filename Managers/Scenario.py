@@ -0,0 +1,85 @@
+"""
+Pyboids - Scenario
+ * A class containing the definitions of the Scenario object, which pre-generates everything random about a
+ * generation from its own seeded generator so that every species faces exactly the same placements, goal respawns
+ * and wander noise, no matter how its run plays out or which process it runs in
+ * Copyright (c) 2019 Meaj
+"""
+import os
+import math
+import shutil
+import tempfile
+import numpy as np
+from Constants import MAX_FORCE
+
+
+class Scenario:
+    FIELDS = ("boid_positions", "goal_positions", "respawn_positions", "wander")
+
+    def __init__(self, seed, boid_number, goal_number, board_dims, boid_radius, step_number):
+        rng = np.random.default_rng(seed)
+        self.seed = seed
+        self.step_number = step_number
+        # Same ranges that deploy_boids and deploy_goals draw from
+        self.boid_positions = np.column_stack((rng.integers(boid_radius, board_dims[0], boid_number),
+                                               rng.integers(15 + boid_radius, board_dims[1], boid_number)))
+        self.goal_positions = self.draw_goal_positions(rng, goal_number, board_dims, boid_radius)
+        # Touched goals are redeployed to these positions in order, each world counts its own respawns
+        self.respawn_positions = self.draw_goal_positions(rng, max(1, goal_number * step_number), board_dims,
+                                                          boid_radius)
+        # Random force applied to each boid on each step when it cannot see a goal
+        self.wander = rng.integers(-MAX_FORCE, MAX_FORCE, (step_number, boid_number, 2), dtype=np.int8)
+        self.directory = None  # Directory holding the memory mapped copies of the arrays once shared
+
+    @classmethod
+    def for_engine(cls, seed, engine):
+        step_number = int(math.ceil(engine.end_time / engine.time_step)) + 2
+        return cls(seed, engine.max_pop, engine.goal_count, (engine.window_width, engine.sim_area_height),
+                   engine.boid_radius, step_number)
+
+    @staticmethod
+    def draw_goal_positions(rng, goal_number, board_dims, boid_radius):
+        return np.column_stack((rng.integers(boid_radius, board_dims[0] - boid_radius, goal_number),
+                                rng.integers(15 + boid_radius, board_dims[1] - boid_radius, goal_number)))
+
+    def get_respawn_position(self, respawn_number):
+        x, y = self.respawn_positions[respawn_number % len(self.respawn_positions)]
+        return int(x), int(y)
+
+    # Returns the wander force of each boid id for the passed step
+    def get_wander(self, step_number, boid_ids):
+        return self.wander[step_number % self.step_number, boid_ids]
+
+    # Writes the arrays to files and maps them back in, worker processes that receive the scenario then map the same
+    # pages instead of being sent a copy of every array
+    def share(self):
+        if self.directory is not None:
+            return
+        self.directory = tempfile.mkdtemp(prefix="pyboids_scenario_")
+        for name in self.FIELDS:
+            path = os.path.join(self.directory, name + ".npy")
+            np.save(path, getattr(self, name))
+            setattr(self, name, np.load(path, mmap_mode="r"))
+
+    # Deletes the shared files, only the process that called share should release the scenario
+    def release(self):
+        if self.directory is None:
+            return
+        for name in self.FIELDS:
+            setattr(self, name, np.array(getattr(self, name)))
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.directory = None
+
+    # A shared scenario is pickled as the location of its files rather than its contents
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if self.directory is not None:
+            for name in self.FIELDS:
+                del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.directory is not None:
+            for name in self.FIELDS:
+                setattr(self, name, np.load(os.path.join(self.directory, name + ".npy"), mmap_mode="r"))
@@ -0,0 +1,761 @@
+"""
+Pyboids - SimulationEngine
+ * A class containing the definitions of the SimulationEngine object, which runs the boid simulation headless with a
+ * fixed time step so that results only depend on the genome and seed, never on the speed of the machine
+ * Copyright (c) 2019 Meaj
+"""
+import os
+import sys
+import random
+import functools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from Constants import *
+from Entities.Entities import Boid
+from Managers.FlockManager import FlockManager
+from Managers.SpatialGrid import SpatialGrid
+from Managers.GoalIndex import GoalIndex, find_nearest_goals
+from Managers.Scenario import Scenario
+from Managers.FitnessCache import FitnessCache
+from Managers.RacingEvaluator import Race
+from Managers.Checkpoint import save_checkpoint, load_checkpoint
+from Managers.GeneticHistory import GeneticHistoryWriter, export_history_text
+from Managers.Trajectory import TrajectoryRecorder
+from Managers.FrameTimer import FrameTimer
+from Managers.EntityPool import EntityPool
+from BoidControllers.GeneticReynoldsControl import move_all_boids_genetic, SeededReynoldsGeneticAlgorithm
+
+
+class SimulationEngine:
+    # Attributes holding the population being simulated, saving them lets a run be continued later or in another process
+    RUN_ATTRIBUTES = ("boid_list", "boid_array", "goal_list", "goal_index", "entity_pool", "flock_manager", "scenario",
+                      "step_number", "respawn_number", "sim_score", "playtime", "frame_timer")
+
+    # random is seeded once by the driver, engines never reseed it since the worlds of a batch, recordings and workers
+    # are all built in the middle of a genetic run and reseeding would change what the next generation breeds
+    def __init__(self, window_width=980, sim_area_height=620, fps=30, boid_radius=7):
+        self.boid_radius = boid_radius
+        self.window_width = window_width  # width of the simulation area
+        self.sim_area_height = sim_area_height  # height of the simulation area
+
+        # Timing data, simulated time advances by time_step every step no matter how long the step took to compute
+        self.FPS = fps
+        self.time_step = 1.0 / fps
+        self.playtime = 0.0
+        self.end_time = 0
+        self.sim_score = 0
+
+        # Entity list declaration
+        self.goal_list = []
+        self.goal_index = None  # Spatial index of goal_list used for nearest goal queries
+        self.goal_count = 5     # Number of goals deployed for each simulation
+        self.boid_list = []
+        self.boid_array = None  # Array backend holding the state of every boid in boid_list
+        self.max_pop = 0
+        self.worker_count = 1   # Number of processes used to evaluate the species of a generation
+        self.batched = False    # Evaluates every species of a generation at once on a headless BatchedSimulationEngine
+        self.batched_engine = None
+        self.entity_pool = EntityPool(boid_radius)  # Boids and goals kept for reuse by later populations
+        self.spare_pools = []  # Pools of saved runs that have been dropped, handed to the engine when it saves a run
+
+        # Scenario the current population was deployed from, None when placements are drawn from random
+        self.scenario = None
+        self.step_number = 0     # Number of steps taken since the population was deployed
+        self.respawn_number = 0  # Number of goals redeployed since the population was deployed
+        self.scenario_seed = None  # Seed of the scenario every generation faces, None to use the generation number
+
+        # Results of genomes that have already been evaluated against a scenario
+        self.fitness_cache = FitnessCache()
+
+        # Racing stops species once they are sure to survive or out of contention, None to run every species to the end
+        self.racing = None
+
+        # File the state of a genetic run is saved to after every species, None to not save it
+        self.checkpoint_path = None
+        self.genetic_state = None       # (genetic algorithm, crossover type, history count) of the generation running
+        self.generation_results = {}    # Results of the species of that generation so far, keyed like the cache
+        # Directory the best species of each generation is recorded to, None to not record them
+        self.trajectory_directory = None
+        self.recorder = None  # Records every step when set
+
+        # Timings of each phase of the frame, exported to the timing directory after every species run when it is set
+        self.frame_timer = FrameTimer()
+        self.timing_directory = None
+
+        # Manager creation
+        self.flock_manager = FlockManager()
+        # Cells are as wide as the distance a boid can see, so neighbours are always in the surrounding 3x3 cells
+        self.spatial_grid = SpatialGrid(boid_radius * 16)
+
+        self.game_state = LOADED
+
+    def set_end_time(self, time):
+        self.end_time = time
+
+    def set_max_pop(self, val):
+        self.max_pop = val
+
+    def set_goal_count(self, val):
+        self.goal_count = val
+
+    def set_worker_count(self, val):
+        self.worker_count = val
+
+    def set_batched(self, val):
+        self.batched = val
+
+    def set_scenario_seed(self, val):
+        self.scenario_seed = val
+
+    def set_fitness_cache(self, cache):
+        self.fitness_cache = cache
+
+    def set_racing(self, racing):
+        self.racing = racing
+
+    def set_checkpoint_path(self, path):
+        self.checkpoint_path = path
+
+    def set_trajectory_directory(self, path):
+        self.trajectory_directory = path
+
+    def set_timing_directory(self, path):
+        self.timing_directory = path
+
+    # Returns everything a worker process needs to build an engine that simulates exactly like this one
+    def get_settings(self):
+        return {"window_width": self.window_width, "sim_area_height": self.sim_area_height, "fps": self.FPS,
+                "boid_radius": self.boid_radius, "end_time": self.end_time, "max_pop": self.max_pop,
+                "goal_count": self.goal_count}
+
+    # Builds a headless engine from the output of get_settings
+    @classmethod
+    def from_settings(cls, settings):
+        engine = cls(settings["window_width"], settings["sim_area_height"], settings["fps"], settings["boid_radius"])
+        engine.apply_settings(settings)
+        return engine
+
+    # Takes on the population and timing settings from the output of get_settings
+    def apply_settings(self, settings):
+        self.set_end_time(settings["end_time"])
+        self.set_max_pop(settings["max_pop"])
+        self.set_goal_count(settings["goal_count"])
+
+    # This is the fitness function we will use to determine the overall "score" of an iteration of the AIs
+    def fitness_function(self, score, survivors=None):
+        # If there are no survivors, the bonus is 0
+        bonus = 0
+        if survivors:
+            for boid in survivors:
+                bonus += boid.get_score()*2 + self.playtime
+        return bonus + score
+
+    # Returns the fitness the species would have if it were stopped now, charging the living boids for their costs
+    def current_fitness(self):
+        score = self.sim_score
+        for boid in self.boid_list:
+            score -= boid.get_cost()
+        return self.fitness_function(score, self.boid_list)
+
+    # Removes boids that have collided and adds scores
+    # Only the boids that collided or touched a goal are walked, in the order of boid_list, and colliding boids are
+    # only marked dead in the alive mask while they are, so each collision costs the same however many boids there are
+    # boid_list is compacted once at the end if anything died. slots defaults to every event of the BoidArray
+    def get_collisions(self, sim_score, slots=None):
+        # Every living boid has looked for goals since the last call, so the goals redeployed then can be reused
+        self.entity_pool.recycle_goals()
+        if slots is None:
+            slots = self.boid_array.get_event_slots()
+        alive = self.boid_array.alive
+        deaths = 0
+        for slot in slots:
+            if not alive[slot]:
+                continue
+            boid = self.boid_array.boids[slot]
+            col = boid.get_collisions()
+            if col:
+                for c in col:
+                    if alive[c.slot]:
+                        # Account for cost when boids die, reward based on time alive out of full time
+                        sim_score -= c.get_cost()
+                        sim_score += c.get_live_time()/10
+                        sim_score += c.get_score()
+                        c.kill()
+                        deaths += 1
+                    # print("{} died due to a collision!".format(c.get_id()))
+                # Account for cost when boids die, reward based on time alive out of full time
+                sim_score -= boid.get_cost()
+                sim_score += boid.get_live_time()/10
+                sim_score += boid.get_score()
+                boid.kill()
+                deaths += 1
+                # print("{} died due to a collision!".format(boid.get_id()))
+            elif boid.get_touched():
+                # print("Boid {} scored a point by touching goal {}".format(boid.get_id(), boid.nearest_goal.get_id()))
+                sim_score += self.flock_manager.update_flock_score(boid)
+                # temporary goal redeployment
+                g_id = boid.nearest_goal.get_id()
+                x, y = self.next_goal_position()
+                self.entity_pool.release_goal(self.goal_list[g_id])
+                self.goal_list[g_id] = self.entity_pool.acquire_goal(g_id, x, y, 3)
+                self.goal_index.replace(self.goal_list[g_id])
+        if deaths:
+            self.boid_list = [boid for boid in self.boid_list if alive[boid.slot]]
+        return sim_score
+
+    # Returns the position of the next redeployed goal, which comes from the scenario's respawn sequence if there is one
+    def next_goal_position(self):
+        if self.scenario is None:
+            return (random.randrange(self.boid_radius, self.window_width - self.boid_radius),
+                    random.randrange(15 + self.boid_radius, self.sim_area_height - self.boid_radius))
+        self.respawn_number += 1
+        return self.scenario.get_respawn_position(self.respawn_number - 1)
+
+    # Finds the connections and collisions of every living boid in one batch, using the spatial grid for candidates
+    def find_all_connections(self):
+        rows = [boid.slot for boid in self.boid_list]
+        candidates = self.spatial_grid.candidate_matrix(self.boid_array.positions, rows)
+        self.boid_array.find_connections(rows, candidates, self.boid_radius * 16)
+
+    # Goal Deployment
+    # Goals are placed by the scenario if there is one, otherwise they are placed randomly
+    def deploy_goals(self, goal_number):
+        for i in range(0, goal_number):
+            if self.scenario is not None:
+                self.goal_list.append(self.entity_pool.acquire_goal(i, int(self.scenario.goal_positions[i][0]),
+                                                                    int(self.scenario.goal_positions[i][1]), 3))
+                continue
+            self.goal_list.append(self.entity_pool.acquire_goal(
+                i, random.randrange(self.boid_radius, self.window_width - self.boid_radius),
+                random.randrange(15 + self.boid_radius, self.sim_area_height - self.boid_radius), 3))
+        self.goal_index = GoalIndex(self.window_width, self.sim_area_height, len(self.goal_list))
+        for goal in self.goal_list:
+            self.goal_index.insert(goal)
+
+    # Boid Deployment
+    # A fresh population reuses the boids of the last one unless an array is passed, otherwise new boids are added to
+    # the existing array
+    def deploy_boids(self, boid_number, boid_array=None):
+        positions = self.get_boid_positions(boid_number)
+        if boid_array is None and not self.boid_list:
+            self.boid_list = self.entity_pool.acquire_boids(range(boid_number), positions)
+            self.boid_array = self.entity_pool.boid_array
+            return
+        if boid_array is not None:
+            self.boid_array = boid_array
+        for i, (x, y) in enumerate(positions):
+            self.boid_list.append(Boid(i, x, y, self.boid_radius, boid_array=self.boid_array))
+
+    # Returns the starting position of each of boid_number boids, placed by the scenario if there is one
+    def get_boid_positions(self, boid_number):
+        if self.scenario is not None:
+            return [(int(x), int(y)) for x, y in self.scenario.boid_positions[:boid_number]]
+        return [(random.randrange(self.boid_radius, self.window_width),
+                 random.randrange(15 + self.boid_radius, self.sim_area_height)) for _ in range(boid_number)]
+
+    # Takes the population out of the simulation, its boids and goals are reused by the next one deployed
+    def clear_population(self):
+        self.entity_pool.release_goals(self.goal_list)
+        self.boid_list = []
+        self.goal_list = []
+
+    # Advances the simulation by one fixed time step, moving every boid according to the passed genome
+    def step(self, genome):
+        self.playtime += self.time_step
+        self.step_number += 1
+
+        timer = self.frame_timer
+        timer.begin()
+
+        # Setup connections and look for goals, only boids in neighbouring grid cells can be connected
+        self.find_all_connections()
+        timer.lap("find_connections")
+        find_nearest_goals(self.boid_array, [boid.slot for boid in self.boid_list], [self.goal_index])
+        timer.lap("find_nearest_goal")
+
+        # Look for all collisions and handle accordingly
+        self.sim_score = self.get_collisions(self.sim_score)
+        timer.lap("get_collisions")
+
+        move_all_boids_genetic(self.boid_list, self.flock_manager,
+                               (self.window_width, self.sim_area_height), self.playtime, genome, self.get_wander())
+        timer.lap("move_all_boids_genetic")
+
+        # Flock formation and Flock Data calculations
+        self.flock_manager.form_flocks(self.boid_list, self.boid_array.connection_edges)
+        timer.lap("form_flocks")
+        self.flock_manager.update_all_flock_data()
+        timer.lap("update_all_flock_data")
+
+        if self.recorder is not None:
+            self.recorder.record_frame(self)
+
+    # Returns the wander force of each boid in boid_list for the current step, or None to draw them from random
+    def get_wander(self):
+        if self.scenario is None:
+            return None
+        ids = np.array([boid.get_id() for boid in self.boid_list], dtype=np.intp)
+        return self.scenario.get_wander(self.step_number - 1, ids)
+
+    # Sets the scenario the next population is deployed from and restarts its step and respawn counts
+    def use_scenario(self, scenario):
+        self.scenario = scenario
+        self.step_number = 0
+        self.respawn_number = 0
+
+    # Called before every step, returns False to skip the step. The headless engine never waits or pauses
+    def begin_frame(self):
+        return True
+
+    # Called after every step so that a subclass can display the simulation
+    def end_frame(self, gen_num, species_number):
+        pass
+
+    # Writes the timings of the run that just finished to the timing directory, if there is one
+    def export_timings(self, name, details):
+        if self.timing_directory is None:
+            return
+        os.makedirs(self.timing_directory, exist_ok=True)
+        self.frame_timer.export(os.path.join(self.timing_directory, name), details)
+
+    # Runs the deployed population with genome until the run ends and returns its fitness. When until is passed, the run
+    # is paused as soon as the simulated time reaches it and None is returned, the next call continues the run
+    def species_simulation(self, genome, gen_num, species_number, until=None):
+        self.game_state = RUN_SIMULATION
+        fitness = 0
+        while self.game_state != EXIT and self.game_state != END_SIMULATION:
+            if self.playtime > self.end_time:
+                fitness = self.current_fitness()
+                print("Fitness was: {}".format(fitness))
+                print("Species {0:} ran for {1:.2f} seconds before being stopped".format(species_number, self.playtime))
+                self.game_state = END_SIMULATION
+                continue
+
+            if until is not None and self.playtime >= until:
+                return None
+
+            # Get key presses/events and wait for the frame when displaying
+            if not self.begin_frame():
+                continue
+
+            self.step(genome)
+
+            # Exits simulation when all boids are dead
+            if len(self.boid_list) == 0:
+                fitness = self.fitness_function(self.sim_score, self.boid_list)
+                print("Fitness was: {}".format(fitness))
+                print("Species {0:} ran for {1:.2f} seconds before all boids died".
+                      format(species_number, self.playtime))
+                self.game_state = END_SIMULATION
+                continue
+
+            # Call our display functions
+            self.end_frame(gen_num, species_number)
+
+        self.export_timings("gen_{}_species_{}.json".format(gen_num, species_number),
+                            {"generation": gen_num, "species": species_number, "boids": self.max_pop,
+                             "playtime": self.playtime})
+        return fitness
+
+    # Deploys a fresh population from the scenario and restarts the clock, the score and the timings
+    def deploy_population(self, scenario):
+        self.use_scenario(scenario)
+        self.clear_population()
+        self.deploy_boids(self.max_pop)
+        self.deploy_goals(self.goal_count)
+        self.playtime = 0
+        self.sim_score = 0
+        self.frame_timer.reset()
+
+    # Returns the state of the population being simulated, which load_run continues from
+    # The engine is given fresh entities, so the populations it deploys next leave the saved one untouched
+    def save_run(self):
+        state = {name: getattr(self, name) for name in self.RUN_ATTRIBUTES}
+        self.boid_list = []
+        self.goal_list = []
+        self.entity_pool = self.spare_pools.pop() if self.spare_pools else EntityPool(self.boid_radius)
+        self.flock_manager = FlockManager()
+        self.frame_timer = FrameTimer()
+        return state
+
+    # Continues the population saved by save_run, the entities the engine held are kept for the runs it saves later
+    def load_run(self, state):
+        self.spare_pools.append(self.entity_pool)
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    # Drops a saved run that will not be continued, its entities are reused by the runs the engine saves later
+    def release_run(self, state):
+        if state is not None:
+            self.spare_pools.append(state["entity_pool"])
+
+    # Returns the seed of the scenario the generation is evaluated against
+    # A fixed scenario seed lets the parents carried into the next generation reuse their results from the cache
+    def get_scenario_seed(self, generation_number):
+        if self.scenario_seed is not None:
+            return self.scenario_seed
+        return generation_number
+
+    # Builds the scenario every species of the generation is evaluated against
+    def build_scenario(self, generation_number):
+        return Scenario.for_engine(self.get_scenario_seed(generation_number), self)
+
+    # Runs a species on a fresh population deployed from the scenario, every species of a generation faces the same
+    # placements, goal respawns and wander forces. Returns the fitness, the time the species was simulated for and
+    # the number of survivors, followed by the outcome of the run and the points it reached at race checkpoints
+    def evaluate_species(self, species, generation_number, scenario=None):
+        if scenario is None:
+            scenario = self.build_scenario(generation_number)
+        self.deploy_population(scenario)
+        fitness = self.species_simulation(species.get_genome(), generation_number, species.get_id())
+        self.use_scenario(None)
+        return fitness, self.playtime, len(self.boid_list), RAN_TO_END, ()
+
+    # Evaluates every species of the generation to the end in species order, in worker processes when an executor is
+    # passed. The simulation never draws from random, so breeding draws the same numbers wherever the species ran
+    # on_result is called with the index and result of each species as soon as its result is back
+    def evaluate_generation(self, species_list, generation_number, executor=None, on_result=None):
+        scenario = self.build_scenario(generation_number)
+        if executor is None:
+            results = []
+            for species in species_list:
+                if self.game_state == EXIT:
+                    break
+                print("Generation {} Species {}".format(generation_number, species.get_id()))
+                results.append(self.evaluate_species(species, generation_number, scenario))
+                if on_result is not None:
+                    on_result(len(results) - 1, results[-1])
+            return results
+        # Workers map the scenario's arrays rather than each receiving a copy
+        scenario.share()
+        results = []
+        try:
+            for result in executor.map(evaluate_species_in_worker, [self.get_settings()] * len(species_list),
+                                       species_list, [generation_number] * len(species_list),
+                                       [scenario] * len(species_list),
+                                       [self.timing_directory] * len(species_list)):
+                if on_result is not None:
+                    on_result(len(results), result)
+                results.append(result)
+        finally:
+            scenario.release()
+        return results
+
+    # Races the species of the list, which are the first entries of race. Every running species is simulated up to a
+    # checkpoint before the race is judged there, so the race is decided the same way however the species are run
+    # The species are run in the chunks of get_race_chunks, each chunk is advanced in a worker process when an executor
+    # is passed. on_result is called with each entry of the race and its result as soon as the entry is settled
+    def race_generation(self, species_list, generation_number, race, executor=None, on_result=None):
+        scenario = self.build_scenario(generation_number)
+        chunks = self.get_race_chunks(len(species_list), executor)
+        chunk_of = {entry: (chunk, position) for chunk, entries in enumerate(chunks)
+                    for position, entry in enumerate(entries)}
+        states = dict.fromkeys(range(len(chunks)))  # State of each chunk still running, None before it starts
+        if executor is not None:
+            scenario.share()
+        try:
+            for checkpoint, until in enumerate(race.checkpoint_times + [None]):
+                running = list(states)
+                chunk_species = [[species_list[entry] for entry in chunks[chunk]] for chunk in running]
+                if executor is None:
+                    advanced = []
+                    for chunk, species in zip(running, chunk_species):
+                        advanced.append(self.advance_chunk(species, generation_number, scenario, states[chunk], until))
+                        if self.game_state == EXIT:
+                            return
+                else:
+                    advanced = executor.map(advance_chunk_in_worker, [type(self)] * len(running),
+                                            [self.get_settings()] * len(running), chunk_species,
+                                            [generation_number] * len(running), [scenario] * len(running),
+                                            [states[chunk] for chunk in running], [until] * len(running),
+                                            [self.timing_directory] * len(running))
+                for chunk, (state, reached) in zip(running, advanced):
+                    states[chunk] = state
+                    for entry, point in zip(chunks[chunk], reached):
+                        if point is not None:
+                            race.record(entry, *point)
+                for entry, result in race.judge(checkpoint):
+                    if entry in chunk_of and result[3] != RAN_TO_END:
+                        chunk, position = chunk_of[entry]
+                        print("Species {0:} was {1:} after {2:.2f} seconds".format(
+                            species_list[entry].get_id(),
+                            "sure to survive" if result[3] == SURE_TO_SURVIVE else "out of contention", result[1]))
+                        self.stop_species(states[chunk], position)
+                    if on_result is not None:
+                        on_result(entry, result)
+                # A chunk is dropped once every species of it is settled
+                for chunk in running:
+                    if states[chunk] is None or all(race.results[entry] is not None for entry in chunks[chunk]):
+                        self.release_run(states.pop(chunk))
+        finally:
+            if executor is not None:
+                scenario.release()
+
+    # Returns the entries of each chunk a race of species_count species is run in, each species is its own chunk here
+    def get_race_chunks(self, species_count, executor=None):
+        return [[entry] for entry in range(species_count)]
+
+    # Continues the run of the species of the chunk saved in state, or starts it when state is None, until the simulated
+    # time reaches until or the run ends. Returns the state to continue from, None once the run has ended, and the
+    # fitness, time and survivors the species reached followed by whether its run has ended
+    def advance_chunk(self, species_list, generation_number, scenario, state, until):
+        species = species_list[0]
+        if state is None:
+            print("Generation {} Species {}".format(generation_number, species.get_id()))
+            self.deploy_population(scenario)
+        else:
+            self.load_run(state)
+        fitness = self.species_simulation(species.get_genome(), generation_number, species.get_id(), until)
+        if fitness is None:
+            reached = (self.current_fitness(), self.playtime, len(self.boid_list), False)
+            return self.save_run(), [reached]
+        self.use_scenario(None)
+        return None, [(fitness, self.playtime, len(self.boid_list), True)]
+
+    # Stops the species at position in a saved chunk. Each species is its own chunk here, so dropping it is enough
+    def stop_species(self, state, position):
+        pass
+
+    # Returns the engine generations are evaluated on, which is this one unless batched evaluation is on
+    # The batched engine is headless and kept between generations so that its worlds and boids are reused
+    def get_generation_engine(self):
+        if not self.batched:
+            return self
+        # Imported here since the batched engine is built on this module
+        from Managers.BatchedSimulationEngine import BatchedSimulationEngine
+        if self.batched_engine is None or self.batched_engine.get_settings() != self.get_settings():
+            self.batched_engine = BatchedSimulationEngine.from_settings(self.get_settings())
+        self.batched_engine.set_worker_count(self.worker_count)
+        self.batched_engine.set_scenario_seed(self.scenario_seed)
+        self.batched_engine.set_timing_directory(self.timing_directory)
+        return self.batched_engine
+
+    # Evaluates the species of the generation like evaluate_generation, but only simulates genomes that are neither in
+    # the fitness cache nor repeated earlier in the list. When racing, the species are raced with race_generation
+    # on_species is called with each species and its result in species order, as soon as the species and every
+    # species before it have a result
+    def evaluate_generation_cached(self, species_list, generation_number, executor=None, on_species=None):
+        settings = self.get_settings()
+        # Raced results hold the points reached at each checkpoint, so they are only reused with the same checkpoints
+        if self.racing is not None:
+            settings["checkpoint_times"] = tuple(self.racing.get_checkpoint_times(self.end_time))
+        scenario_seed = self.get_scenario_seed(generation_number)
+        keys = [FitnessCache.make_key(species.get_genome(), scenario_seed, settings) for species in species_list]
+        known = {}
+        pending = {}
+        # Results stop at the first species that was not evaluated, such as when the simulation was exited
+        results = []
+
+        def report():
+            while len(results) < len(keys) and keys[len(results)] in known:
+                results.append(known[keys[len(results)]])
+                if on_species is not None:
+                    on_species(species_list[len(results) - 1], results[-1])
+
+        def keep(entry, result):
+            key = entry_keys[entry]
+            # Species stopped early were judged against the rest of their generation, so only full runs are cached
+            if result[3] == RAN_TO_END:
+                self.fitness_cache.put(key, result)
+            known[key] = result
+            self.keep_generation_result(key, result)
+            report()
+
+        for key, species in zip(keys, species_list):
+            if key in known or key in pending:
+                continue
+            # Species evaluated before the run was resumed keep their result, even if they were stopped early
+            result = self.generation_results.get(key)
+            if result is None:
+                result = self.fitness_cache.get(key)
+            if result is None:
+                pending[key] = species
+            else:
+                print("Generation {} Species {} was already evaluated".format(generation_number, species.get_id()))
+                known[key] = result
+                self.generation_results[key] = result
+        entry_keys = list(pending)
+        engine = self.get_generation_engine()
+        if self.racing is None:
+            report()
+            engine.evaluate_generation(list(pending.values()), generation_number, executor, keep)
+            return results
+        # Known results are raced again from the points they reached, since the rest of the generation decides whether
+        # they are stopped early
+        replays = list(known)
+        entry_keys += replays
+        race = Race(self.racing, self.end_time, [None] * len(pending) + [known.pop(key) for key in replays],
+                    [keys.count(key) for key in entry_keys])
+        engine.race_generation(list(pending.values()), generation_number, race, executor, keep)
+        return results
+
+    # Keeps the result of a species of the running generation and saves it to the checkpoint, so that resuming never
+    # simulates the species again. Races are replayed from the results saved, so resuming decides them the same way
+    def keep_generation_result(self, key, result):
+        self.generation_results[key] = result
+        if self.checkpoint_path is None or self.genetic_state is None:
+            return
+        self.save_genetic_state(*self.genetic_state)
+
+    # Simulates the species against the scenario of its generation again, recording every frame to path
+    # Scenarios make the simulation deterministic, so the recording is exactly the run that was evaluated
+    def record_species(self, species, generation_number, path):
+        engine = SimulationEngine.from_settings(self.get_settings())
+        engine.set_scenario_seed(self.scenario_seed)
+        engine.recorder = TrajectoryRecorder(path, self.max_pop, self.goal_count, self.FPS, generation_number,
+                                             species.get_id(), (self.window_width, self.sim_area_height))
+        try:
+            return engine.evaluate_species(species, generation_number)
+        finally:
+            engine.recorder.close()
+
+    # Controls the simulation
+    # A scenario_seed makes every generation face the same scenario, so the parents carried into the next generation
+    # are found in the fitness cache instead of being simulated again. Without one each generation faces the scenario
+    # of its generation number, and the cache only finds genomes repeated within a generation or from earlier runs
+    def run_genetic_reynolds_simulation(self, crossover_type=6, generations=25, species=24, mutation_rate=20,
+                                        genome=None, scenario_seed=None):
+        if scenario_seed is not None:
+            self.set_scenario_seed(scenario_seed)
+        # the number of iterations per generation, the mutation rate denominator, and our seed
+        if not genome:
+            genome = [random.uniform(-1, 1), random.uniform(-1, 1),  random.uniform(-1, 1), random.uniform(-1, 1),
+                      random.uniform(-1, 1), random.uniform(-1, 1)]
+        genetic_algorithm = SeededReynoldsGeneticAlgorithm(generations, species, mutation_rate, genome)
+        if self.end_time == 0:
+            self.end_time = 10
+        if self.max_pop == 0:
+            self.max_pop = 32
+        # A fresh run starts a fresh history file
+        history_path = "genetic_history_method_{}.bin".format(crossover_type)
+        if os.path.exists(history_path):
+            os.remove(history_path)
+        self.run_generations(genetic_algorithm, crossover_type)
+
+    # Continues the genetic run saved in the checkpoint from the first generation it had not completed
+    def resume_genetic_reynolds_simulation(self, checkpoint_path):
+        state = load_checkpoint(checkpoint_path)
+        self.apply_settings(state["settings"])
+        self.set_scenario_seed(state["scenario_seed"])
+        self.set_batched(state.get("batched", False))
+        self.set_racing(state.get("racing"))
+        random.setstate(state["random_state"])
+        self.set_checkpoint_path(checkpoint_path)
+        print("Resuming from generation {} with {} species evaluated".format(
+            state["genetic_algorithm"].generation_number, len(state.get("generation_results", {}))))
+        self.run_generations(state["genetic_algorithm"], state["crossover_type"], state["history_count"],
+                             state.get("generation_results"))
+
+    # Saves everything needed to continue the genetic run from the generation it is on, along with the results of the
+    # species of that generation evaluated so far
+    # history_count is the number of records in the history file when the generation started
+    def save_genetic_state(self, genetic_algorithm, crossover_type, history_count):
+        save_checkpoint(self.checkpoint_path, {"settings": self.get_settings(), "scenario_seed": self.scenario_seed,
+                                               "batched": self.batched, "racing": self.racing,
+                                               "random_state": random.getstate(),
+                                               "crossover_type": crossover_type,
+                                               "genetic_algorithm": genetic_algorithm, "history_count": history_count,
+                                               "generation_results": self.generation_results})
+
+    # Gives the species its result and appends it to the history
+    @staticmethod
+    def update_species(history, generation_number, species, result):
+        fitness, live_time, survivors, terminated = result[:4]
+        species.update_live_time(live_time)
+        species.update_survivors(survivors)
+        species.update_performance(fitness)
+        species.update_terminated(terminated)
+        history.append(generation_number, species.get_id(), species.get_genome(), fitness, species.get_livetime(),
+                       species.get_survivors())
+
+    # Evaluates and breeds the generations of the genetic algorithm until the last one, then writes out the history
+    # Every evaluated species is streamed to the binary history file, history_count records of it are kept on resume
+    # generation_results holds the progress made on the first generation before the run was stopped
+    def run_generations(self, genetic_algorithm, crossover_type, history_count=None, generation_results=None):
+        history = GeneticHistoryWriter("genetic_history_method_{}.bin".format(crossover_type), history_count)
+        self.generation_results = dict(generation_results or {})
+        self.fitness_cache.open()
+        # Species are farmed out to a pool of headless worker processes when more than one worker is requested
+        executor = None
+        if self.worker_count > 1:
+            executor = ProcessPoolExecutor(max_workers=self.worker_count)
+        # The pool and the history file are closed even if evaluation raises or the run is interrupted
+        try:
+            # Loop through each generation
+            while genetic_algorithm.generation_number < genetic_algorithm.max_generation and self.game_state != EXIT:
+                # Loop through each species
+                for idx, species in enumerate(genetic_algorithm.get_species_list()):
+                    species.set_id(idx+1)
+                self.genetic_state = (genetic_algorithm, crossover_type, history.count)
+                # Each species is written to the history as soon as its result is in
+                results = self.evaluate_generation_cached(genetic_algorithm.get_species_list(),
+                                                          genetic_algorithm.generation_number, executor,
+                                                          functools.partial(self.update_species, history,
+                                                                            genetic_algorithm.generation_number))
+                # Find best species from each generation
+                best_score = -sys.maxsize - 1
+                best_species = genetic_algorithm.get_species_list()[0]
+                for species in genetic_algorithm.get_species_list():
+                    tst = species.get_performance()
+                    if tst > best_score:
+                        best_score = tst
+                        best_species = species
+                # Store genetic data for best in each generation
+                # The genes are copied since the genome is handed on to the next generation
+                best_genome = best_species.get_genome()
+                genetic_algorithm.genetic_history_best_performers.append([genetic_algorithm.generation_number,
+                                                                          best_species.get_id(),
+                                                                          [best_genome[gene] for gene in
+                                                                           range(len(best_genome))], best_score,
+                                                                          best_species.get_livetime(),
+                                                                          best_species.get_survivors()])
+                if self.trajectory_directory is not None and len(results) == len(genetic_algorithm.get_species_list()):
+                    os.makedirs(self.trajectory_directory, exist_ok=True)
+                    self.record_species(best_species, genetic_algorithm.generation_number,
+                                        os.path.join(self.trajectory_directory, "gen_{}_species_{}.traj".format(
+                                            genetic_algorithm.generation_number, best_species.get_id())))
+
+                self.genetic_state = None
+                self.generation_results = {}
+                genetic_algorithm.advance_generation(crossover_type)
+                # A generation cut short by exiting is not saved, resuming keeps the species saved as they were
+                # evaluated and evaluates the rest
+                if self.checkpoint_path is not None and len(results) == len(genetic_algorithm.get_species_list()):
+                    self.save_genetic_state(genetic_algorithm, crossover_type, history.count)
+        finally:
+            self.genetic_state = None
+            history.close()
+            self.fitness_cache.close()
+            if executor is not None:
+                executor.shutdown()
+        # Determine best performing genome and display it
+        best_species = genetic_algorithm.get_species_list()[0]
+        for species in genetic_algorithm.get_species_list():
+            if species.performance > best_species.performance:
+                best_species = species
+        print("The best genome evolved after {} generations was {}".format(genetic_algorithm.max_generation,
+                                                                           best_species.get_genome()))
+        best_performers = open("best_performers_method_{}.txt".format(crossover_type), "w")
+        best_performers.write("Generation;Species;Chromosome;Performance;Live Time;Survivors\n")
+        for entry in genetic_algorithm.genetic_history_best_performers:
+            best_performers.write("{};{};{};{};{};{}\n".format(entry[0], entry[1], entry[2], entry[3], entry[4],
+                                                               entry[5]))
+        best_performers.close()
+        export_history_text("genetic_history_method_{}.bin".format(crossover_type),
+                            "genetic_history_method_{}.txt".format(crossover_type))
+
+
+# Builds a headless engine from the passed settings and evaluates a species with it, used by worker processes
+def evaluate_species_in_worker(settings, species, generation_number, scenario, timing_directory=None):
+    engine = SimulationEngine.from_settings(settings)
+    engine.set_timing_directory(timing_directory)
+    return engine.evaluate_species(species, generation_number, scenario)
+
+
+# Builds a headless engine of engine_class from the passed settings and advances a chunk of a race with it, used by
+# worker processes
+def advance_chunk_in_worker(engine_class, settings, species_list, generation_number, scenario, state, until,
+                            timing_directory=None):
+    engine = engine_class.from_settings(settings)
+    engine.set_timing_directory(timing_directory)
+    return engine.advance_chunk(species_list, generation_number, scenario, state, until)
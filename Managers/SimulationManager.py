@@ -3,65 +3,83 @@ Pyboids - SimulationManager
  * A class containing the definitions of the SimulationManager object
  * Copyright (c) 2019 Meaj
 """
-import sys
-import random
+import os
+import time
+import functools
+import pygame
+import numpy as np
 from Constants import *
-from Entities.Entities import Boid, Goal
+from Entities.Entities import Boid
+from Entities.BoidArray import BoidArray
 from Entities.MenuEntities import Button, InputBox
 from Managers.FlockManager import FlockManager
-from BoidControllers.GeneticReynoldsControl import move_all_boids_genetic, \
-    ReynoldsChromosome, SeededReynoldsGeneticAlgorithm
+from Managers.SimulationEngine import SimulationEngine
+from Managers.Trajectory import TrajectoryReader
+from Managers.FrameTimer import PHASES
+from Managers.RenderCache import RenderCache
+from Managers.Renderer import Renderer
+from Managers.FlockMonitor import FlockMonitor
+from BoidControllers.GeneticReynoldsControl import ReynoldsChromosome
 
 
-class SimulationManager:
+# The SimulationManager displays the SimulationEngine and provides the menus used to set it up
+class SimulationManager(SimulationEngine):
     def __init__(self, window_width=980, sim_area_height=620, fps=30, boid_radius=7,
                  visual_mode=True, flock_monitoring=False, version="0.0.0"):
-        # Initialize random and pygame
-        random.seed()
-        pygame.init()
-        # Setup Window
-        pygame.display.set_caption("PyBoids Ver. {}".format(version))
-        self.boid_radius = boid_radius
-        self.window_width = window_width  # width of the window and simulation area
-        self.sim_area_height = sim_area_height  # height of the simulation area
+        super().__init__(window_width, sim_area_height, fps, boid_radius)
         self.window_height = sim_area_height + 15 * 10
         self.version = version
-
-        # Timing and monitoring data
-        self.clock = pygame.time.Clock()
-        self.FPS = fps
-        self.playtime = 0.0
         self.show_centroids = False
-        self.end_time = 0
-
-        # Entity list declaration
-        self.goal_list = []
-        self.boid_list = []
-        self.max_pop = 0
+        self.show_timings = False  # Shows the rolling percentiles of each phase of the frame under the overview
+        self.time_warp = TIME_WARPS[0]  # Steps run for each displayed frame, 0 to run steps until the next frame is due
+        self.steps_since_draw = 0       # Steps run since the last displayed frame
+        self.frame_drawn = True         # True when the last step was drawn, so the next one starts a new frame
+        self.next_draw_time = 0.0       # time.perf_counter() the next frame is due at when time_warp is 0
+        self.visual_mode = visual_mode
+        self.flock_monitoring = flock_monitoring
+        self.monitor_refresh_rate = 4  # Times a second the flock data panel is redrawn, 0 to redraw it every frame
+        # The best species of each generation is recorded here so that it can be replayed from the load menu
+        self.trajectory_directory = "trajectories"
+        # The phase timings of every species run are exported here
+        self.timing_directory = "timings"
 
-        # Manager creation
+        # pygame is only initialised when displaying, a headless manager runs purely on the SimulationEngine
         if visual_mode:
-            if not flock_monitoring:
-                self.window_height = self.sim_area_height
-            self.screen = pygame.display.set_mode((self.window_width, self.sim_area_height), pygame.DOUBLEBUF)
-            # Setup Background
-            self.background = pygame.Surface(self.screen.get_size()).convert()
-            self.background.fill(BLACK)
+            self.setup_display(boid_radius)
 
-            # Boid image setup
-            self.boid_image = pygame.image.load("Sprites/boid_sprite.png")
-            self.boid_image.convert_alpha(self.boid_image)
-            pygame.display.set_icon(self.boid_image)
-            self.boid_image = pygame.transform.smoothscale(self.boid_image, (boid_radius * 2, boid_radius * 2))
+    # Initializes pygame, the window, the sprites and the menu widgets
+    def setup_display(self, boid_radius):
+        pygame.init()
+        # Setup Window
+        pygame.display.set_caption("PyBoids Ver. {}".format(self.version))
 
-            # Font setup
-            self.normal_font = pygame.font.SysFont('courier new', 12, bold=True)
-            self.large_font = pygame.font.SysFont('courier new', 48, bold=True)
+        # Timing and monitoring data, the clock only paces the display to real time
+        self.clock = pygame.time.Clock()
 
-        self.visual_mode = visual_mode
-        self.flock_monitoring = flock_monitoring
+        # Manager creation
+        if not self.flock_monitoring:
+            self.window_height = self.sim_area_height
+        self.screen = pygame.display.set_mode((self.window_width, self.window_height), pygame.DOUBLEBUF)
+        # Setup Background
+        self.background = pygame.Surface(self.screen.get_size()).convert()
+        self.background.fill(BLACK)
 
-        self.flock_manager = FlockManager()
+        # Boid image setup
+        self.boid_image = pygame.image.load("Sprites/boid_sprite.png")
+        self.boid_image.convert_alpha(self.boid_image)
+        pygame.display.set_icon(self.boid_image)
+        self.boid_image = pygame.transform.smoothscale(self.boid_image, (boid_radius * 2, boid_radius * 2))
+        self.render_cache = RenderCache(self.boid_image)
+        self.renderer = Renderer(self.screen, self.background, self.render_cache)
+        # Top and bottom lines of the sim area
+        self.renderer.add_background_line(GREEN, (0, 12), (self.window_width, 12))
+        self.renderer.add_background_line(GREEN, (0, self.sim_area_height), (self.window_width, self.sim_area_height))
+
+        # Font setup
+        self.normal_font = pygame.font.SysFont('courier new', 12, bold=True)
+        self.large_font = pygame.font.SysFont('courier new', 48, bold=True)
+        self.flock_monitor = FlockMonitor(self.normal_font, self.window_width,
+                                          self.window_height - self.sim_area_height, self.monitor_refresh_rate)
 
         # Button creation
         self.main_menu_button = Button("Main Menu", -1000, -1000, 120, 60, self.start_menu)
@@ -73,57 +91,9 @@ class SimulationManager:
         # TextBox creation
         self.population_input = InputBox("", "Population Size", -1000, -1000, 60, 14)
         self.runtime_input = InputBox("", "Run Time Seconds", -1000, -1000, 60, 14)
+        self.workers_input = InputBox("", "Worker Processes", -1000, -1000, 60, 14)
 
-        self.text_boxes = [self.population_input, self.runtime_input]
-
-        self.game_state = LOADED
-
-    def set_end_time(self, time):
-        self.end_time = time
-
-    def set_max_pop(self, val):
-        self.max_pop = val
-
-    # This is the fitness function we will use to determine the overall "score" of an iteration of the AIs
-    def fitness_function(self, score, survivors=None):
-        # If there are no survivors, the bonus is 0
-        bonus = 0
-        if survivors:
-            for boid in survivors:
-                bonus += boid.get_score()*2 + self.playtime
-        return bonus + score
-
-    # Removes boids that have collided and adds scores
-    def get_collisions(self, sim_score):
-        for boid in self.boid_list:
-            col = boid.get_collisions()
-            if col:
-                for c in col:
-                    if c in self.boid_list:
-                        # Account for cost when boids die, reward based on time alive out of full time
-                        sim_score -= c.get_cost()
-                        sim_score += c.get_live_time()/10
-                        sim_score += c.get_score()
-                        self.boid_list.remove(c)
-                    # print("{} died due to a collision!".format(c.get_id()))
-                    del c
-                # Account for cost when boids die, reward based on time alive out of full time
-                sim_score -= boid.get_cost()
-                sim_score += boid.get_live_time()/10
-                sim_score += boid.get_score()
-                self.boid_list.remove(boid)
-                # print("{} died due to a collision!".format(boid.get_id()))
-                del boid
-            elif boid.get_touched():
-                # print("Boid {} scored a point by touching goal {}".format(boid.get_id(), boid.nearest_goal.get_id()))
-                sim_score += self.flock_manager.update_flock_score(boid)
-                # temporary goal redeployment
-                g_id = boid.nearest_goal.get_id()
-                self.goal_list[g_id] = Goal(g_id, random.randrange(self.boid_radius,
-                                                                   self.window_width - self.boid_radius),
-                                            random.randrange(15 + self.boid_radius, self.sim_area_height -
-                                                             self.boid_radius), 3)
-        return sim_score
+        self.text_boxes = [self.population_input, self.runtime_input, self.workers_input]
 
     # Check for keyboard input
     def listen_for_keys(self):
@@ -144,6 +114,20 @@ class SimulationManager:
             # Toggle centroid data on or off
             if presses[pygame.K_TAB] and self.game_state == RUN_SIMULATION:
                 self.show_centroids = not self.show_centroids
+            # Toggle frame timings on or off
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_t and not any(box.input_active for box in
+                                                                                  self.text_boxes):
+                self.show_timings = not self.show_timings
+            # Cycle the time warp with w
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_w and not any(box.input_active for box in
+                                                                                  self.text_boxes):
+                self.set_time_warp(TIME_WARPS[(TIME_WARPS.index(self.time_warp) + 1) % len(TIME_WARPS)])
+            # Scroll the flock data panel with the page keys or the mouse wheel
+            if event.type == pygame.KEYDOWN and event.key in (pygame.K_PAGEUP, pygame.K_PAGEDOWN):
+                rows = self.flock_monitor.visible_rows * (-1 if event.key == pygame.K_PAGEUP else 1)
+                self.flock_monitor.scroll(rows, len(self.flock_manager.flock_list))
+            if event.type == pygame.MOUSEWHEEL:
+                self.flock_monitor.scroll(-event.y, len(self.flock_manager.flock_list))
             for box in self.text_boxes:
                 box.handle_event(event)
 
@@ -152,243 +136,115 @@ class SimulationManager:
             import pdb
             pdb.set_trace()
 
-    # Goal Deployment
-    def deploy_goals(self, goal_number):
-        for i in range(0, goal_number):
-            self.goal_list.append(Goal(i, random.randrange(self.boid_radius, self.window_width - self.boid_radius),
-                                  random.randrange(15 + self.boid_radius,
-                                  self.sim_area_height - self.boid_radius), 3))
+    # The panel is redrawn at most monitor_refresh_rate times a second and only for the rows scrolled into view
+    def display_flock_data(self):
+        if not self.flock_monitoring:
+            return
+        self.renderer.blit(self.flock_monitor.get_panel(self.flock_manager.get_flocks()), (0, self.sim_area_height+1))
 
-    # Boid Deployment
-    def deploy_boids(self, boid_number):
-        for i in range(0, boid_number):
-            self.boid_list.append(Boid(i, random.randrange(self.boid_radius, self.window_width),
-                                       random.randrange(15 + self.boid_radius, self.sim_area_height), self.boid_radius))
+    def set_time_warp(self, val):
+        self.time_warp = val
+        self.steps_since_draw = 0
 
-    def display_flock_data(self):
-        flock_list = self.flock_manager.get_flocks()
-        monitor = pygame.Surface((self.window_width, self.window_height - self.sim_area_height))
-        monitor.blit(
-            self.normal_font.render("Number  |     Centroids    |  Direction  |  Goal Direction  |  Score  |  Members",
-                                    True, GREEN), (11, 0))
-
-        for idx, flock in enumerate(flock_list):
-            members = []
-            for member in flock.flock_members:
-                members.append(member.get_id())
-            cent = "{:3.2f}, {:3.2f}".format(flock.flock_centroid.x, flock.flock_centroid.y)
-            string = "{0:^6}{1:^5s}{2:^15}{1:^4s}{3:^10.2f}{1:^4s}{4:^14.2f}{1:^5s}{5:^6d}{1:^4s}{6:}".\
-                format(idx + 1, "|", cent, flock.flock_velocity.argument(),
-                       flock.flock_goal_dir, flock.flock_score, members)
-            monitor.blit(self.normal_font.render(string, True, GREEN), (12, (idx + 1) * 13))
-            pygame.draw.line(monitor, GREEN, (0, (idx+1) * 13), (self.window_width, (idx + 1) * 13))
-        pygame.draw.line(monitor, GREEN, (0, (len(flock_list) + 1) * 13), (self.window_width,
-                                                                           (len(flock_list) + 1) * 13))
-        self.screen.blit(monitor, (0, self.sim_area_height+1))
+    def set_monitor_refresh_rate(self, refresh_rate):
+        self.monitor_refresh_rate = refresh_rate
+        self.flock_monitor.set_refresh_rate(refresh_rate)
 
     # Displays monitoring data at the top of the screen
     # clock.get_fps(), playtime, len(flocks.get_flocks()), gen_num, iter_num
     def display_simulation_overview(self, gen_num, species_num):
-        text = "FPS: {:6.2f}{}PLAYTIME: {:6.2f}{}FLOCKS: {}{}GENERATION: {}{}SPECIES: {}".\
+        warp = "{}x".format(self.time_warp) if self.time_warp else "MAX"
+        text = "FPS: {:6.2f}{}PLAYTIME: {:6.2f}{}FLOCKS: {}{}GENERATION: {}{}SPECIES: {}{}WARP: {}".\
             format(self.clock.get_fps(), " " * 5, self.playtime, " " * 5, len(self.flock_manager.flock_list), " " * 5,
-                   gen_num, " " * 5, species_num)
+                   gen_num, " " * 5, species_num, " " * 5, warp)
         surface = self.normal_font.render(text, True, (0, 255, 0))
-        self.screen.blit(surface, (0, 0))
+        self.renderer.blit(surface, (0, 0))
+        if self.show_timings:
+            self.display_frame_timings()
+
+    # Displays the 50th, 95th and 99th percentile time of each phase of the recent frames
+    def display_frame_timings(self):
+        lines = ["{:<24}{:>8}{:>8}{:>8}".format("PHASE (MS)", "P50", "P95", "P99")]
+        for phase in PHASES:
+            percentiles = self.frame_timer.get_percentiles(phase)
+            if percentiles is not None:
+                lines.append("{:<24}{:>8.2f}{:>8.2f}{:>8.2f}".format(phase, *percentiles))
+        for idx, line in enumerate(lines):
+            self.renderer.blit(self.normal_font.render(line, True, GREEN), (6, 16 + idx * 13))
 
     def draw_simulation_screen(self, gen_num=0, iter_num=0):
-        # Clear the screen
-        self.background.fill(BLACK)
+        # Clear what was drawn last frame
+        self.renderer.begin_frame()
         # Draw the monitoring at the top of the screen
         self.display_simulation_overview(gen_num, iter_num)
         # Draw objects in the simulation area
-        for boid in self.boid_list:
-            boid.display_boid(self.boid_image, self.screen, self.background, self.show_centroids)
-        for goal in self.goal_list:
-            goal.display_goal(self.screen)
+        self.renderer.draw_boids(self.boid_list, self.show_centroids)
+        self.renderer.draw_goals(self.goal_list)
         if self.show_centroids:
             # Draw flock centroids and velocity vectors
-            for flock in self.flock_manager.flock_list:
-                flock.display_flock_centroid_vectors(self.screen, self.background)
+            self.renderer.draw_centroids(self.flock_manager.flock_list)
         # Draw the flock data at the bottom
         self.display_flock_data()
-        # Draw bottom line for sim area
-        pygame.draw.line(self.background, GREEN, (0, self.sim_area_height), (self.window_width, self.sim_area_height))
-        # Draw top line for sim area
-        pygame.draw.line(self.background, GREEN, (0, 12), (self.window_width, 12))
-        pygame.display.flip()  # (╯°□°)╯︵ ┻━┻
-        self.screen.blit(self.background, (0, 0))
-
-    def species_simulation(self, genome, gen_num, species_number):
-        self.playtime = 0
-        num_flocks = 0
-        self.game_state = RUN_SIMULATION
-        sim_score = 0
-        fitness = 0
-        while self.game_state != EXIT and self.game_state != END_SIMULATION:
-            if self.playtime > self.end_time:
-                for boid in self.boid_list:
-                    sim_score -= boid.get_cost()
-                fitness = self.fitness_function(sim_score, self.boid_list)
-                print("Fitness was: {}".format(fitness))
-                print("Species {0:} ran for {1:.2f} seconds before being stopped".format(species_number, self.playtime))
-                self.game_state = END_SIMULATION
-                continue
-
-            # Get key presses/events
-            if self.visual_mode:
-                self.listen_for_keys()
-
-            # Timing calculations
-            if self.game_state == PAUSE_SIMULATION:
-                self.clock.tick_busy_loop()
-                continue
-            self.playtime += self.clock.tick(self.FPS) / 1000.0
-
-            # Setup connections and look for goals
-            for temp_boid in self.boid_list:
-                temp_boid.find_connections(self.boid_list)
-                temp_boid.find_nearest_goal(self.goal_list)
-
-            # Look for all collisions and handle accordingly
-            sim_score = self.get_collisions(sim_score)
-
-            move_all_boids_genetic(self.boid_list, self.flock_manager,
-                                   (self.window_width, self.sim_area_height), self.playtime, genome)
-
-            # Flock formation and Flock Data calculations
-            self.flock_manager.form_flocks(self.boid_list)
-            self.flock_manager.update_all_flock_data()
-            if num_flocks != len(self.flock_manager.get_flocks()):
-                num_flocks = len(self.flock_manager.get_flocks())
-
-            # Exits simulation when all boids are dead
-            if len(self.boid_list) == 0:
-                fitness = self.fitness_function(sim_score, self.boid_list)
-                print("Fitness was: {}".format(fitness))
-                print("Species {0:} ran for {0:.2f} seconds before all boids died".
-                      format(species_number, self.playtime))
-                self.game_state = END_SIMULATION
-                continue
-
-            # Call our display functions
-            if self.visual_mode:
-                self.draw_simulation_screen(gen_num, species_number)
-
-        return fitness
-
-    # Controls the simulation
-    def run_genetic_reynolds_simulation(self, crossover_type=6, generations=25, species=24, mutation_rate=20,
-                                        genome=None):
-        # the number of iterations per generation, the mutation rate denominator, and our seed
-        if not genome:
-            genome = [random.uniform(-1, 1), random.uniform(-1, 1),  random.uniform(-1, 1), random.uniform(-1, 1),
-                      random.uniform(-1, 1), random.uniform(-1, 1)]
-        genetic_algorithm = SeededReynoldsGeneticAlgorithm(generations, species, mutation_rate, genome)
-        if self.end_time == 0:
-            self.end_time = 10
-        if self.max_pop == 0:
-            self.max_pop = 32
-        # Loop through each generation
-        while genetic_algorithm.generation_number < genetic_algorithm.max_generation and self.game_state != EXIT:
-            # Loop through each species
-            for idx, species in enumerate(genetic_algorithm.get_species_list()):
-                if self.game_state == EXIT:
-                    break
-                self.playtime = 0
-                # Try to ensure that each species has the same seed for goal and boid placement
-                random.seed(genetic_algorithm.generation_number)
-                species.set_id(idx+1)
-                print("Generation {} Species {}".format(genetic_algorithm.generation_number, species.get_id()))
-                # Create new population for each generation
-                self.boid_list = []
-                self.goal_list = []
-                self.deploy_boids(self.max_pop)
-                self.deploy_goals(5)
-                fitness = self.species_simulation(species.get_genome(), genetic_algorithm.generation_number,
-                                                  species.get_id())
-                species.update_live_time(self.playtime)
-                species.update_survivors(len(self.boid_list))
-                species.update_performance(fitness)
-                genetic_algorithm.genetic_history.append(
-                    [genetic_algorithm.generation_number, species.get_id(),
-                     species.get_genome(), fitness,
-                     species.get_livetime(), species.get_survivors()])
-            # Find best species from each generation
-            best_score = -sys.maxsize - 1
-            best_species = genetic_algorithm.get_species_list()[0]
-            for species in genetic_algorithm.get_species_list():
-                tst = species.get_performance()
-                if tst > best_score:
-                    best_score = tst
-                    best_species = species
-            # Store genetic data for best in each generation
-            genetic_algorithm.genetic_history_best_performers.append([genetic_algorithm.generation_number,
-                                                                      best_species.get_id(),
-                                                                      best_species.get_genome(), best_score,
-                                                                      best_species.get_livetime(),
-                                                                      best_species.get_survivors()])
-
-            genetic_algorithm.advance_generation(crossover_type)
-        # Determine best performing genome and display it
-        best_species = genetic_algorithm.get_species_list()[0]
-        for species in genetic_algorithm.get_species_list():
-            if species.performance > best_species.performance:
-                best_species = species
-        print("The best genome evolved after {} generations was {}".format(genetic_algorithm.max_generation,
-                                                                           best_species.get_genome()))
-        best_performers = open("best_performers_method_{}.txt".format(crossover_type), "w")
-        best_performers.write("Generation;Species;Chromosome;Performance;Live Time;Survivors\n")
-        for entry in genetic_algorithm.genetic_history_best_performers:
-            best_performers.write("{};{};{};{};{};{}\n".format(entry[0], entry[1], entry[2], entry[3], entry[4],
-                                                               entry[5]))
-        best_performers.close()
-        gene_history = open("genetic_history_method_{}.txt".format(crossover_type), "w")
-        gene_history.write("Generation;Species;Chromosome;Performance;Live Time;Survivors\n")
-        for entry in genetic_algorithm.genetic_history:
-            gene_history.write("{};{};{};{};{};{}\n".format(entry[0], entry[1], entry[2], entry[3], entry[4], entry[5]))
-        gene_history.close()
+        # Only the parts of the screen that changed are pushed to the display
+        self.renderer.end_frame()
+
+    # Handles key presses and paces the display to FPS frames a second, returns False while paused
+    # Keys are only handled and the display only waits at the start of a displayed frame, the other steps of the frame
+    # run back to back so that drawing never holds the physics back
+    def begin_frame(self):
+        if not self.visual_mode or not self.frame_drawn:
+            return True
+        # Get key presses/events
+        self.listen_for_keys()
+        if self.game_state == PAUSE_SIMULATION:
+            self.clock.tick_busy_loop()
+            return False
+        # The highest warp never waits, its frames are as long as the steps run in them
+        self.clock.tick(self.FPS if self.time_warp else 0)
+        self.next_draw_time = time.perf_counter() + 1 / self.FPS
+        self.frame_drawn = False
+        return True
+
+    # Draws the latest state once every step of the frame has run, time_warp steps or until the next frame is due
+    def end_frame(self, gen_num, species_number):
+        if not self.visual_mode:
+            return
+        self.steps_since_draw += 1
+        if self.time_warp:
+            if self.steps_since_draw < self.time_warp:
+                return
+        elif time.perf_counter() < self.next_draw_time:
+            return
+        self.frame_timer.begin()
+        self.draw_simulation_screen(gen_num, species_number)
+        self.frame_timer.lap("draw_simulation_screen")
+        self.steps_since_draw = 0
+        self.frame_drawn = True
 
     # Game loop
     def run_specific_iteration(self):
         self.playtime = 0
         num_flocks = 0
         self.game_state = RUN_SIMULATION
-        sim_score = 0
+        self.sim_score = 0
 
-        self.deploy_goals(5)
+        self.deploy_goals(self.goal_count)
         if self.end_time == 0:
             self.end_time = 60
         if self.max_pop == 0:
             self.max_pop = 32
         self.deploy_boids(self.max_pop)
+        genome = ReynoldsChromosome(-0.10676215125149979, 0.40063408129207856, 0.8399627680188892, 0.585753191716833,
+                                    -0.7086453393098968, 0.8958986441229899)
         while self.game_state != EXIT:
             if self.playtime > self.end_time:
                 break
 
-            # Get key presses/events
-            self.listen_for_keys()
-
-            # Timing calculations
-            if self.game_state == PAUSE_SIMULATION:
-                self.clock.tick_busy_loop()
+            # Get key presses/events and wait for the frame
+            if not self.begin_frame():
                 continue
-            self.playtime += self.clock.tick(self.FPS) / 1000.0
-
-            # Setup connections and look for goals
-            for temp_boid in self.boid_list:
-                temp_boid.find_connections(self.boid_list)
-                temp_boid.find_nearest_goal(self.goal_list)
-
-            # Look for all collisions and handle accordingly
-            sim_score = self.get_collisions(sim_score)
-
-            genome = ReynoldsChromosome(-0.10676215125149979, 0.40063408129207856, 0.8399627680188892, 0.585753191716833, -0.7086453393098968, 0.8958986441229899)
-            move_all_boids_genetic(self.boid_list, self.flock_manager,
-                                   (self.window_width, self.sim_area_height), self.playtime, genome)
 
-            # Flock formation and Flock Data calculations
-            self.flock_manager.form_flocks(self.boid_list)
-            self.flock_manager.update_all_flock_data()
+            self.step(genome)
             if num_flocks != len(self.flock_manager.get_flocks()):
                 num_flocks = len(self.flock_manager.get_flocks())
                 print("There are {} flocks".format(num_flocks))
@@ -396,24 +252,93 @@ class SimulationManager:
             # Exits simulation when all boids are dead
             if len(self.boid_list) == 0:
                 self.game_state = EXIT
-                print("Fitness was: {}".format(self.fitness_function(sim_score)))
+                print("Fitness was: {}".format(self.fitness_function(self.sim_score)))
                 print("This sim was run for {0:.2f} seconds before all boids died".format(self.playtime))
                 pygame.quit()
                 exit()
 
             # Call our display functions
-            if self.visual_mode:
-                self.draw_simulation_screen(1, 1)
+            self.end_frame(1, 1)
 
-        print("Fitness was: {}".format(self.fitness_function(sim_score, self.boid_list)))
+        print("Fitness was: {}".format(self.fitness_function(self.sim_score, self.boid_list)))
         pygame.quit()
         print("This sim was run for {0:.2f} seconds before yeeting".format(self.playtime))
         self.game_state = EXIT
         exit()
 
+    # Replays a recorded trajectory through draw_simulation_screen without running any physics
+    # Space pauses, the arrow keys scrub a frame at a time, up and down seek a second, home and end jump to either
+    # end, the number keys jump to tenths of the recording and holding the right mouse button scrubs to the cursor
+    def replay_trajectory(self, path):
+        trajectory = TrajectoryReader(path)
+        self.boid_array = BoidArray(trajectory.boid_count, self.boid_radius)
+        for slot in range(trajectory.boid_count):
+            Boid(slot, 0, 0, self.boid_radius, boid_array=self.boid_array)
+        self.flock_manager = FlockManager()
+        frame_number = 0
+        self.game_state = RUN_SIMULATION
+        while self.game_state != EXIT:
+            self.listen_for_keys()
+            if trajectory.frame_count:
+                frame_number = self.seek_replay(frame_number, trajectory)
+                self.show_replay_frame(trajectory, frame_number)
+            self.frame_timer.begin()
+            self.draw_simulation_screen(trajectory.generation, trajectory.species)
+            self.frame_timer.lap("draw_simulation_screen")
+            self.clock.tick(trajectory.fps)
+            # The last frame stays on screen until the replay is exited
+            if self.game_state == RUN_SIMULATION and frame_number < trajectory.frame_count - 1:
+                frame_number += 1
+        print("Program exited from replay")
+        pygame.quit()
+        exit()
+
+    # Returns the frame the replay moves to for the keys and mouse buttons currently held
+    def seek_replay(self, frame_number, trajectory):
+        presses = pygame.key.get_pressed()
+        last_frame = trajectory.frame_count - 1
+        second = max(1, int(round(trajectory.fps)))
+        if presses[pygame.K_LEFT]:
+            frame_number -= 1
+        if presses[pygame.K_RIGHT]:
+            frame_number += 1
+        if presses[pygame.K_DOWN]:
+            frame_number -= second
+        if presses[pygame.K_UP]:
+            frame_number += second
+        if presses[pygame.K_HOME]:
+            frame_number = 0
+        if presses[pygame.K_END]:
+            frame_number = last_frame
+        for tenth, key in enumerate((pygame.K_0, pygame.K_1, pygame.K_2, pygame.K_3, pygame.K_4, pygame.K_5,
+                                     pygame.K_6, pygame.K_7, pygame.K_8, pygame.K_9)):
+            if presses[key]:
+                frame_number = last_frame * tenth // 10
+        if pygame.mouse.get_pressed()[2]:
+            frame_number = int(pygame.mouse.get_pos()[0] / self.window_width * last_frame)
+        return min(max(frame_number, 0), last_frame)
+
+    # Loads a recorded frame into the boids, goals and flocks that draw_simulation_screen displays
+    def show_replay_frame(self, trajectory, frame_number):
+        frame = trajectory.frames[frame_number]
+        count = trajectory.boid_count
+        self.playtime = float(frame["playtime"])
+        self.boid_array.positions[:count] = frame["positions"]
+        self.boid_array.velocities[:count] = trajectory.get_velocities(frame_number)
+        self.boid_array.headings[:count] = frame["headings"]
+        self.boid_array.alive[:count] = frame["alive"]
+        slots = np.nonzero(frame["alive"])[0]
+        self.boid_list = [self.boid_array.boids[slot] for slot in slots]
+        self.entity_pool.release_goals(self.goal_list)
+        self.goal_list = [self.entity_pool.acquire_goal(idx, float(x), float(y), 3)
+                          for idx, (x, y) in enumerate(frame["goal_positions"])]
+        self.flock_manager.assign_flocks(self.boid_list, frame["flock_labels"][slots].astype(np.intp))
+        self.flock_manager.update_all_flock_data()
+
     # Runs the start menu
     def start_menu(self):
         self.game_state = MAIN_MENU
+        self.renderer.reset()
         self.load_menu_button.set_pos(self.window_width / 2 - 60, 5 * self.window_height / 8)
         self.setup_menu_button.set_pos(self.window_width / 2 - 60, 1 * self.window_height / 2)
         while self.game_state != EXIT:
@@ -453,10 +378,12 @@ class SimulationManager:
     # Runs the menu for setting up a new simulation
     def simulation_setup_menu(self):
         self.game_state = NEW_SIM_MENU
+        self.renderer.reset()
         self.start_sim_button.set_pos(self.window_width / 3 - 60, 3 * self.window_height / 4)
         self.main_menu_button.set_pos(2 * self.window_width / 3 - 60, 3 * self.window_height / 4)
         self.population_input.set_pos(self.window_width/3, 200)
         self.runtime_input.set_pos(self.window_width/3, 224)
+        self.workers_input.set_pos(self.window_width/3, 248)
         while self.game_state != EXIT:
             self.listen_for_keys()
 
@@ -465,11 +392,15 @@ class SimulationManager:
 
             self.population_input.draw_box(self.screen)
             self.runtime_input.draw_box(self.screen)
+            self.workers_input.draw_box(self.screen)
 
             if self.population_input.in_text:
                 self.set_max_pop(int(self.population_input.in_text))
             if self.runtime_input.in_text:
                 self.set_end_time(int(self.runtime_input.in_text))
+            # More than one worker evaluates the species of each generation in parallel, without displaying them
+            if self.workers_input.in_text:
+                self.set_worker_count(max(1, int(self.workers_input.in_text)))
 
             self.main_menu_button.check_click()
             self.main_menu_button.draw_button(self.screen)
@@ -487,19 +418,40 @@ class SimulationManager:
         pygame.quit()
         exit()
 
-    # Runs the menu for loading a simulation file or manually input species
+    # Returns the paths of the recorded trajectories, most recent first
+    def find_trajectories(self):
+        if self.trajectory_directory is None or not os.path.isdir(self.trajectory_directory):
+            return []
+        paths = [os.path.join(self.trajectory_directory, name) for name in os.listdir(self.trajectory_directory)
+                 if name.endswith(".traj")]
+        return sorted(paths, key=os.path.getmtime, reverse=True)
+
+    # Runs the menu for replaying a recorded trajectory or running the stored species
     def simulation_load_menu(self):
         self.game_state = LOAD_SIM_MENU
+        # Menus draw over the whole screen, so the first frame drawn after one is drawn in full
+        self.renderer.reset()
         self.main_menu_button.set_pos(2 * self.window_width / 3 - 60, 3 * self.window_height / 4)
         self.load_sim_button.set_pos(self.window_width / 3 - 60, 3 * self.window_height / 4)
+        # One button for each of the most recent recordings
+        replay_buttons = []
+        for idx, path in enumerate(self.find_trajectories()[:8]):
+            name = os.path.splitext(os.path.basename(path))[0]
+            replay_buttons.append(Button(name, self.window_width / 2 - 90, self.window_height / 4 + 16 + idx * 34, 180,
+                                         30, functools.partial(self.replay_trajectory, path)))
         while self.game_state != EXIT:
             self.listen_for_keys()
             self.background.fill(BLACK)
             self.screen.blit(self.background, (0, 0))
-            title = "Load Simulation: Coming Soon"
+            title = "Load Simulation"
+            if not replay_buttons:
+                title = "No Recordings Found"
             title_surf, title_rect = text_setup(title, self.large_font)
             title_rect.center = (self.window_width / 2, 3 * self.window_height / 16)
 
+            for button in replay_buttons:
+                button.check_click()
+                button.draw_button(self.screen)
             self.main_menu_button.check_click()
             self.main_menu_button.draw_button(self.screen)
             self.load_sim_button.check_click()
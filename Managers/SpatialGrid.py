@@ -0,0 +1,51 @@
+"""
+Pyboids - SpatialGrid
+ * A class containing the definitions of the SpatialGrid object, a uniform grid used to find nearby entities
+ * Copyright (c) 2019 Meaj
+"""
+import numpy as np
+
+
+class SpatialGrid:
+    def __init__(self, cell_size):
+        self.cell_size = cell_size  # Width and height of a cell, must be at least the largest search radius
+
+    # Returns an (N, K) array holding, for each of the N slots in rows, the slots of every boid in rows that lies in
+    # the surrounding 3x3 cells. Rows with fewer than K candidates are padded with -1, the boid itself is included
+    # If groups is passed, boids are only candidates of boids with the same group, such as boids of the same world
+    def candidate_matrix(self, positions, rows, groups=None):
+        rows = np.asarray(rows, dtype=np.intp)
+        if len(rows) == 0:
+            return np.full((0, 0), -1, dtype=np.intp)
+        # A one cell border means that the keys of the neighbouring cells never wrap around the grid
+        cells = np.floor(positions[rows] / self.cell_size).astype(np.intp)
+        cells -= cells.min(axis=0) - 1
+        height = cells[:, 1].max() + 2
+        if groups is not None:
+            # Groups are laid out side by side, so their borders keep them from ever neighbouring each other
+            cells[:, 0] += np.asarray(groups, dtype=np.intp) * (cells[:, 0].max() + 2)
+        keys = cells[:, 0] * height + cells[:, 1]
+        order = np.argsort(keys, kind="stable")
+        counts = np.bincount(keys, minlength=(cells[:, 0].max() + 2) * height)
+        starts = np.cumsum(counts) - counts
+
+        # Each row gathers 9 runs of the sorted boids, one for each neighbouring cell
+        offsets = np.array([col * height + row for col in (-1, 0, 1) for row in (-1, 0, 1)])
+        neighbours = keys[:, None] + offsets
+        return gather_runs(starts[neighbours], counts[neighbours], rows[order])
+
+
+# Lays out runs of the sorted values along the columns of an (N, K) matrix padded with -1, row n holds the run of
+# length counts[n, j] starting at starts[n, j] for each column j in turn
+def gather_runs(starts, counts, values):
+    run_lengths = counts.ravel()
+    flat = np.arange(run_lengths.sum())
+    run_offsets = np.cumsum(run_lengths) - run_lengths
+    gathered = values[np.repeat(starts.ravel() - run_offsets, run_lengths) + flat]
+
+    # The runs of each row are consecutive, so they are laid out along the columns of that row
+    totals = counts.sum(axis=1)
+    row_offsets = np.cumsum(totals) - totals
+    matrix = np.full((len(counts), totals.max(initial=0)), -1, dtype=np.intp)
+    matrix[np.repeat(np.arange(len(counts)), totals), flat - np.repeat(row_offsets, totals)] = gathered
+    return matrix
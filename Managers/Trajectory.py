@@ -0,0 +1,80 @@
+"""
+Pyboids - Trajectory
+ * Classes containing the definitions of the TrajectoryRecorder and TrajectoryReader objects, which write the state of
+ * every frame of a simulation to a compact binary file and map it back in for replay without running any physics
+ * Copyright (c) 2019 Meaj
+"""
+import os
+import numpy as np
+
+TRAJECTORY_MAGIC = b"PYBOIDST"
+TRAJECTORY_VERSION = 1
+TRAJECTORY_HEADER = np.dtype([("magic", "S8"), ("version", "<u4"), ("boid_count", "<u4"), ("goal_count", "<u4"),
+                              ("fps", "<f8"), ("generation", "<i4"), ("species", "<i4"), ("width", "<u4"),
+                              ("height", "<u4")])
+
+
+# Frames have a fixed size, so frame k starts k frame sizes after the header and every frame can be seeked directly
+def make_frame_dtype(boid_count, goal_count):
+    return np.dtype([("playtime", "<f8"), ("positions", "<f4", (boid_count, 2)), ("headings", "<f4", (boid_count,)),
+                     ("alive", "?", (boid_count,)), ("flock_labels", "<i4", (boid_count,)),
+                     ("goal_positions", "<f4", (goal_count, 2))])
+
+
+class TrajectoryRecorder:
+    # Records the first boid_count BoidArray slots and the goal_count goals of an engine on every recorded frame
+    def __init__(self, path, boid_count, goal_count, fps, generation=0, species=0, board_dims=(0, 0)):
+        self.boid_count = boid_count
+        self.goal_count = goal_count
+        self.frame = np.zeros(1, dtype=make_frame_dtype(boid_count, goal_count))  # Reused for every frame
+        self.frame_count = 0
+        self.trajectory_file = open(path, "wb")
+        header = np.array((TRAJECTORY_MAGIC, TRAJECTORY_VERSION, boid_count, goal_count, fps, generation, species,
+                           board_dims[0], board_dims[1]), dtype=TRAJECTORY_HEADER)
+        self.trajectory_file.write(header.tobytes())
+
+    def record_frame(self, engine):
+        boid_array = engine.boid_array
+        count = min(self.boid_count, boid_array.count)
+        frame = self.frame[0]
+        frame["playtime"] = engine.playtime
+        frame["positions"][:count] = boid_array.positions[:count]
+        frame["headings"][:count] = boid_array.headings[:count]
+        frame["alive"][:count] = boid_array.alive[:count]
+        frame["alive"][count:] = False
+        frame["flock_labels"][:count] = boid_array.flock_labels[:count]
+        for goal in engine.goal_list[:self.goal_count]:
+            frame["goal_positions"][goal.get_id()] = goal.pos.x, goal.pos.y
+        self.trajectory_file.write(self.frame.tobytes())
+        self.frame_count += 1
+
+    def close(self):
+        self.trajectory_file.close()
+
+
+class TrajectoryReader:
+    def __init__(self, path):
+        header = np.fromfile(path, dtype=TRAJECTORY_HEADER, count=1)
+        if len(header) == 0 or header["magic"][0] != TRAJECTORY_MAGIC or \
+                header["version"][0] != TRAJECTORY_VERSION:
+            raise ValueError("{} is not a version {} trajectory file".format(path, TRAJECTORY_VERSION))
+        header = header[0]
+        self.boid_count = int(header["boid_count"])
+        self.goal_count = int(header["goal_count"])
+        self.fps = float(header["fps"])
+        self.generation = int(header["generation"])
+        self.species = int(header["species"])
+        self.board_dims = (int(header["width"]), int(header["height"]))
+        frame_dtype = make_frame_dtype(self.boid_count, self.goal_count)
+        # A recording cut short keeps every frame that was written in full
+        self.frame_count = (os.path.getsize(path) - TRAJECTORY_HEADER.itemsize) // frame_dtype.itemsize
+        if self.frame_count == 0:
+            self.frames = np.zeros(0, dtype=frame_dtype)
+        else:
+            self.frames = np.memmap(path, dtype=frame_dtype, mode="r", offset=TRAJECTORY_HEADER.itemsize,
+                                    shape=(self.frame_count,))
+
+    # Returns the velocity of every boid in the frame, as the distance each moved since the frame before
+    def get_velocities(self, frame_number):
+        previous = self.frames[max(frame_number - 1, 0)]["positions"]
+        return self.frames[frame_number]["positions"].astype(float) - previous
@@ -3,16 +3,66 @@ Pyboids
  * An exploration of the ability of various AIs to develop flocking behavior
  * Copyright (c) 2019 Meaj
 """
-
+import random
+import argparse
 from Managers.SimulationManager import SimulationManager
+from Managers.FitnessCache import FitnessCache
+from Managers.RacingEvaluator import RacingEvaluator
 from Constants import VERSION
 # best so far:
 # -0.2726218754477409, 0.22531065494572736, 0.012347193295672765, 0.4056808036681063, 0.5633023671766649, 0.768
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Evolves flocking behaviour with a genetic algorithm")
+    parser.add_argument("--batched", action="store_true",
+                        help="evaluate each generation headless with every species side by side, which is faster but "
+                             "does not display the species as they run")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes the species of each generation are evaluated in, more than one does "
+                             "not display the species as they run")
+    parser.add_argument("--fitness-cache", metavar="PATH",
+                        help="file the results of evaluated genomes are kept in, so that no genome is simulated twice "
+                             "against the same scenario, even across runs")
+    parser.add_argument("--scenario-seed", type=int,
+                        help="seed of the scenario every generation faces, otherwise each generation faces a different "
+                             "scenario. Results are only reused across generations with a fixed seed, since they are "
+                             "cached per scenario")
+    parser.add_argument("--racing", action="store_true",
+                        help="compares the species of each generation at checkpoints through their runs and stops "
+                             "those sure to make the top half or out of contention, which simulates about 2.5 times "
+                             "fewer seconds. Species stopped early keep the fitness they had when stopped")
+    parser.add_argument("--racing-fractions", type=float, nargs="+", default=[0.25, 0.5, 0.75], metavar="FRACTION",
+                        help="fractions of the run time at which raced species are compared")
+    parser.add_argument("--racing-margin", type=float, default=1.0,
+                        help="median absolute deviations of fitness a raced species must be clear of the cutoff by "
+                             "to be stopped, lower margins stop more species")
+    parser.add_argument("--timing-directory", metavar="DIR", default="timings",
+                        help="directory the phase timings of every species run are written to")
+    parser.add_argument("--checkpoint", metavar="PATH",
+                        help="file the genetic run is saved to after every species, so that it can be resumed")
+    parser.add_argument("--resume", metavar="PATH",
+                        help="continues the genetic run saved in the checkpoint file, with the settings it was saved "
+                             "with, before showing the menu")
+    args = parser.parse_args()
+
+    # Initialize random
+    random.seed()
     manager = SimulationManager(visual_mode=True, version=VERSION)
+    manager.set_batched(args.batched)
+    manager.set_worker_count(max(1, args.workers))
+    manager.set_scenario_seed(args.scenario_seed)
+    if args.racing:
+        manager.set_racing(RacingEvaluator(args.racing_fractions, args.racing_margin))
+    if args.fitness_cache is not None:
+        manager.set_fitness_cache(FitnessCache(path=args.fitness_cache))
+    manager.set_timing_directory(args.timing_directory)
+    manager.set_checkpoint_path(args.checkpoint)
+    if args.resume is not None:
+        manager.resume_genetic_reynolds_simulation(args.resume)
     manager.start_menu()
 
 
-main()
+# Worker processes re-import this module when they are spawned, so the menu is only started by the main process
+if __name__ == "__main__":
+    main()